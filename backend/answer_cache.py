@@ -0,0 +1,211 @@
+# ============================================================
+#  answer_cache.py  —  Digital-Vakeel Semantic Answer Cache
+#  Skips the Groq call for questions we've already answered.
+#
+#  Lookup order:
+#    1. Exact match on the normalized question text
+#    2. Nearest cached question by embedding similarity
+#       (cosine ≥ SIMILARITY_THRESHOLD) — catches rephrasings
+#
+#  Entries expire after TTL_SECONDS and the least-recently-used entry
+#  is evicted past MAX_ENTRIES. Entries are kept in memory and written
+#  through to answer_cache.db (SQLite, one row per answer), so a put
+#  costs one row write rather than rewriting the whole cache, and
+#  several processes can share the file safely. The db records the
+#  vector store fingerprint; if the store is rebuilt the old answers
+#  are dropped on load.
+# ============================================================
+
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# ─────────────────────────────────────────────────────────────
+#  CONFIGURATION
+# ─────────────────────────────────────────────────────────────
+
+CACHE_DB             = os.path.join(os.path.dirname(__file__), "answer_cache.db")
+MAX_ENTRIES          = int(os.environ.get("ANSWER_CACHE_SIZE", "500"))
+TTL_SECONDS          = int(os.environ.get("ANSWER_CACHE_TTL", str(7 * 24 * 3600)))   # 1 week
+SIMILARITY_THRESHOLD = float(os.environ.get("ANSWER_CACHE_SIMILARITY", "0.95"))
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, collapse whitespace, drop trailing punctuation."""
+    q = re.sub(r"\s+", " ", question.strip().lower())
+    return q.rstrip(" ?!.")
+
+
+def vectorstore_fingerprint(vectorstore_dir: str) -> str:
+    """Identify a built vector store by its files' sizes and mtimes."""
+    parts = []
+    for name in sorted(os.listdir(vectorstore_dir)) if os.path.isdir(vectorstore_dir) else []:
+        st = os.stat(os.path.join(vectorstore_dir, name))
+        parts.append(f"{name}:{st.st_size}:{st.st_mtime_ns}")
+    return "|".join(parts)
+
+
+class AnswerCache:
+    """
+    Thread-safe LRU + TTL cache of RAG answers, keyed by normalized
+    question and searchable by (normalized) question embedding.
+    """
+
+    def __init__(self, fingerprint: str, path: str = CACHE_DB,
+                 max_entries: int = MAX_ENTRIES, ttl: int = TTL_SECONDS,
+                 threshold: float = SIMILARITY_THRESHOLD):
+        self.fingerprint = fingerprint
+        self.path        = path
+        self.max_entries = max_entries
+        self.ttl         = ttl
+        self.threshold   = threshold
+        self._lock       = threading.Lock()
+        self._entries    = OrderedDict()   # key → {"answer", "sources", "embedding", "created"}
+        self._keys       = []               # row order of self._matrix
+        self._matrix     = None             # stacked embeddings, rebuilt lazily
+        self._db         = None
+        self.hits        = 0
+        self.misses      = 0
+        if path:
+            self._open()
+
+    # ── persistence ──
+
+    def _open(self):
+        try:
+            self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                " question TEXT PRIMARY KEY, answer TEXT NOT NULL, sources TEXT NOT NULL,"
+                " embedding BLOB NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+            row = self._db.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+            if row is None or row[0] != self.fingerprint:
+                if row is not None:
+                    print("   ♻️  Vector store changed — answer cache invalidated")
+                self._reset_db()
+                return
+
+            # Most recently written first, so the LRU keeps the newest
+            rows = self._db.execute(
+                "SELECT question, answer, sources, embedding, created FROM answers"
+                " WHERE created > ? ORDER BY rowid DESC LIMIT ?",
+                (time.time() - self.ttl, self.max_entries),
+            ).fetchall()
+            for key, answer, sources, blob, created in reversed(rows):
+                self._entries[key] = {
+                    "answer":    answer,
+                    "sources":   json.loads(sources),
+                    "embedding": np.frombuffer(blob, dtype=np.float32),
+                    "created":   created,
+                }
+        except Exception as e:
+            print(f"   ⚠️  Answer cache store unavailable, memory only: {e}")
+            self._db = None
+
+    def _write(self, sql, params=()):
+        """Run one write against the store. Caller holds the lock."""
+        if self._db is None:
+            return
+        try:
+            self._db.execute(sql, params)
+        except Exception as e:
+            print(f"   ⚠️  Answer cache write failed: {e}")
+
+    def _reset_db(self):
+        """Empty the store and stamp it with our fingerprint. Caller holds the lock."""
+        self._write("DELETE FROM answers")
+        self._write("INSERT OR REPLACE INTO meta (key, value) VALUES ('fingerprint', ?)",
+                    (self.fingerprint,))
+
+    # ── lookup / insert ──
+
+    def _nearest(self, embedding):
+        """Most similar cached key and its cosine score (embeddings are normalized)."""
+        if self._matrix is None:
+            self._keys = list(self._entries.keys())
+            self._matrix = (np.stack([self._entries[k]["embedding"] for k in self._keys])
+                            if self._keys else None)
+        if self._matrix is None:
+            return None, 0.0
+        scores = self._matrix @ np.asarray(embedding, dtype=np.float32)
+        i = int(np.argmax(scores))
+        return self._keys[i], float(scores[i])
+
+    def _drop(self, key):
+        del self._entries[key]
+        self._matrix = None
+        self._write("DELETE FROM answers WHERE question = ?", (key,))
+
+    def get(self, question: str, embedding) -> dict:
+        """Return a cached {"answer", "sources"} or None."""
+        key = normalize_question(question)
+        with self._lock:
+            if key not in self._entries:
+                key, score = self._nearest(embedding)
+                if key is None or score < self.threshold:
+                    self.misses += 1
+                    return None
+            entry = self._entries[key]
+            if time.time() - entry["created"] >= self.ttl:
+                self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return {"answer": entry["answer"], "sources": entry["sources"]}
+
+    def put(self, question: str, embedding, answer: str, sources: list, fingerprint: str = None):
+        """
+        Cache an answer, evicting the least recently used past max_entries.
+        fingerprint: the store the answer was retrieved from — answers from
+        a store that has since been swapped out are dropped.
+        """
+        key = normalize_question(question)
+        with self._lock:
+            if fingerprint is not None and fingerprint != self.fingerprint:
+                return
+            entry = {
+                "answer":    answer,
+                "sources":   sources,
+                "embedding": np.asarray(embedding, dtype=np.float32),
+                "created":   time.time(),
+            }
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._write(
+                "INSERT OR REPLACE INTO answers (question, answer, sources, embedding, created)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, answer, json.dumps(sources), entry["embedding"].tobytes(), entry["created"]),
+            )
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+            self._matrix = None
+
+    def invalidate(self, fingerprint: str = None):
+        """Drop every entry (e.g. after the vector store is rebuilt)."""
+        with self._lock:
+            if fingerprint is not None:
+                self.fingerprint = fingerprint
+            self._entries.clear()
+            self._matrix = None
+            self._reset_db()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries":  len(self._entries),
+                "hits":     self.hits,
+                "misses":   self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            }
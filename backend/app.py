@@ -4,17 +4,25 @@
 #  Run this with: python app.py
 # ============================================================
 
-import requests
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
+from itsdangerous import URLSafeTimedSerializer, BadSignature
 from flask_jwt_extended import (
     JWTManager, create_access_token, jwt_required, get_jwt_identity
 )
 import bcrypt
+import base64
+import hmac
 import json
 import os
 import re
-from datetime import datetime, timedelta
-from invoice_engine import Invoice, calculate
+import threading
+import time
+from datetime import date, datetime, timedelta
+from invoice_engine import (
+    Invoice, calculate, calculate_batch, date_ordinals, status_date_range,
+    STATUS_CODES, STATUS_AGE_RANGES, STATUS_PAID, PAYMENT_WINDOW_DAYS, DAILY_RATE,
+    normalize_date,
+)
 
 app = Flask(__name__)
 
@@ -32,30 +40,76 @@ from database import (
     init_db, create_user, get_user_by_email, get_user_by_id,
     save_chat_message, get_chat_history, clear_chat_history,
     save_invoice_db, get_invoices_for_user, get_invoice_by_id, mark_invoice_paid_db,
-    log_notice, get_notices,
+    get_invoice_summary,
+    get_notices,
 )
 
 
 # ─────────────────────────────────────────────
 #  RAG ENGINE
 # ─────────────────────────────────────────────
+# Loaded in a background thread so the server answers /auth/* at once.
+# /chat returns 503 with rag_status until the engine is ready.
 rag_engine = None
+rag_status = {"state": "loading", "stage": "starting", "progress": 0.0, "error": None}
+
+# Token for /admin/* routes (X-Admin-Token header); unset = admin routes disabled
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
+def _rag_progress(stage, fraction):
+    rag_status["stage"]    = stage
+    rag_status["progress"] = round(fraction, 2)
 
 def init_rag():
     global rag_engine
+    started = time.time()
     try:
         from rag_engine import RAGEngine
-        rag_engine = RAGEngine()
-        if rag_engine.is_ready():
-            print("✅ RAG Legal Assistant is READY!")
+        engine = RAGEngine(progress=_rag_progress)
+        rag_engine = engine
+        if engine.is_ready():
+            rag_status["state"] = "ready"
+            print(f"✅ RAG Legal Assistant is READY! ({time.time() - started:.1f}s)")
         else:
+            rag_status.update(state="failed", error="Vector store not found")
             print("⚠️  RAG engine loaded but vector store not found.")
+        # Hot-swap new builds from build_vectorstore.py without a restart
+        engine.start_watcher(on_reload=_rag_reloaded)
     except Exception as e:
+        rag_status.update(state="failed", error=str(e))
         print(f"⚠️  RAG engine failed: {e}")
 
-init_rag()
+def _rag_reloaded(result):
+    rag_status.update(state="ready", error=None)
+
+def rag_unavailable():
+    """503 response for chat routes while the engine warms up (or if it failed)."""
+    if rag_status["state"] == "loading":
+        message = f"Legal assistant is starting up ({rag_status['stage']}). Please retry shortly."
+    else:
+        message = "Legal assistant is not available."
+    resp = jsonify({"ok": False, "error": message, "rag": rag_status})
+    resp.headers["Retry-After"] = "5"
+    return resp, 503
+
+threading.Thread(target=init_rag, name="rag-warmup", daemon=True).start()
+
+# Supabase connection check — off the startup path too
+threading.Thread(target=init_db, name="db-check", daemon=True).start()
 
-OCR_SERVICE_URL = os.environ.get("OCR_SERVICE_URL", "http://localhost:8000/extract")
+# OCR microservice client (pooled, timeouts, circuit breaker)
+import ocr_client
+
+# Outbound notice queue — background workers send queued notices.
+# Set NOTICE_QUEUE_WORKERS=0 when running `python notice_queue.py` separately.
+from notice_queue import init_queue, start_workers, enqueue_notice, get_job
+init_queue()
+start_workers(int(os.environ.get("NOTICE_QUEUE_WORKERS", "2")))
+
+# Daily Day-46/60/67 notices — opt-in so only one process runs it
+if os.environ.get("ENABLE_SCHEDULER") == "1":
+    from scheduler import start_scheduler
+    start_scheduler()
 
 
 # ─────────────────────────────────────────────
@@ -91,6 +145,88 @@ def error(message, status=400):
     return jsonify({"ok": False, "error": message}), status
 
 
+# ─────────────────────────────────────────────
+#  INVOICE LISTING HELPERS
+# ─────────────────────────────────────────────
+
+# Stored columns a client may ask for via ?fields=
+INVOICE_COLUMNS = (
+    "id", "invoice_no", "invoice_date", "seller_name", "buyer_name", "amount",
+    "paid", "paid_date", "buyer_gstin", "buyer_contact", "udyam_id", "notices",
+    "created_at",
+)
+# Live values filled in by calculate_batch() — need date, amount and paid
+COMPUTED_FIELDS = (
+    "due_date", "status", "days_overdue", "days_until_due",
+    "interest_accrued", "total_due",
+)
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE     = 200
+
+
+def _encode_cursor(row):
+    """Opaque page cursor: (created_at, id) of the last row sent."""
+    raw = f"{row['created_at']}|{row['id']}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+# Invoice ids are short uppercase tokens (see Invoice.id)
+INVOICE_ID_RE = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+def _decode_cursor(cursor):
+    """
+    Inverse of _encode_cursor. Raises ValueError on garbage.
+    Both parts end up in a PostgREST filter string, so they are
+    validated and re-serialized here rather than passed through.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+    except Exception:
+        raise ValueError("Invalid cursor")
+    created_at, sep, invoice_id = raw.rpartition("|")
+    if not sep or not INVOICE_ID_RE.fullmatch(invoice_id):
+        raise ValueError("Invalid cursor")
+    try:
+        created_at = datetime.fromisoformat(created_at).isoformat()
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    return created_at, invoice_id
+
+def _has_valid_date(row):
+    try:
+        normalize_date(row["invoice_date"])
+        return True
+    except (ValueError, TypeError):
+        return False
+
+def _with_live_values(rows):
+    """
+    Fill in the computed fields for a page of rows in one vectorized pass.
+    A row whose invoice_date can't be parsed is returned as stored, so one
+    bad row doesn't fail the whole page.
+    """
+    try:
+        ordinals = date_ordinals([r["invoice_date"] for r in rows])
+    except ValueError:
+        good = [r for r in rows if _has_valid_date(r)]
+        if good:
+            _with_live_values(good)
+        return rows
+
+    calc = {k: v.tolist() for k, v in calculate_batch(
+        ordinals,
+        [r["amount"] for r in rows],
+        [r["paid"] for r in rows],
+    ).items()}
+    for i, row in enumerate(rows):
+        row["due_date"]         = date.fromordinal(calc["due_date"][i]).isoformat()
+        row["status"]           = STATUS_CODES[calc["status_code"][i]]
+        row["days_overdue"]     = calc["days_overdue"][i]
+        row["days_until_due"]   = calc["days_until_due"][i]
+        row["interest_accrued"] = calc["interest_accrued"][i]
+        row["total_due"]        = calc["total_due"][i]
+    return rows
+
+
 # ═════════════════════════════════════════════
 #  AUTH ROUTES
 # ═════════════════════════════════════════════
@@ -222,7 +358,7 @@ def create_invoice():
         return error("Amount must be a positive number")
 
     try:
-        datetime.strptime(data["invoice_date"], "%Y-%m-%d")
+        invoice_date = normalize_date(data["invoice_date"])
     except Exception:
         return error("invoice_date must be in YYYY-MM-DD format")
 
@@ -230,7 +366,7 @@ def create_invoice():
         seller_name=data["seller_name"].strip(),
         buyer_name=data["buyer_name"].strip(),
         invoice_no=data["invoice_no"].strip(),
-        invoice_date=data["invoice_date"],
+        invoice_date=invoice_date,
         amount=amount,
         udyam_id=data.get("udyam_id", "").strip(),
         buyer_contact=data.get("buyer_contact", "").strip(),
@@ -247,30 +383,89 @@ def create_invoice():
 @app.route("/invoices", methods=["GET"])
 @jwt_required()
 def list_invoices():
+    """
+    List the user's invoices, newest first, one page at a time.
+
+    Query params (all optional):
+      limit   : page size (default 50, max 200)
+      cursor  : next_cursor from the previous page
+      status  : one status, e.g. OVERDUE or PAID
+      buyer   : part of the buyer name
+      from/to : invoice_date range, YYYY-MM-DD (inclusive)
+      fields  : comma-separated fields to return (default: all)
+    """
     user_id = int(get_jwt_identity())
-    invoices = get_invoices_for_user(user_id)
-    # Recalculate live values
-    results = []
-    for inv_data in invoices:
+    args = request.args
+
+    try:
+        limit = int(args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return error("limit must be an integer")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return error(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    after = None
+    if args.get("cursor"):
         try:
-            inv = Invoice(
-                seller_name=inv_data["seller_name"],
-                buyer_name=inv_data["buyer_name"],
-                invoice_no=inv_data["invoice_no"],
-                invoice_date=inv_data["invoice_date"],
-                amount=inv_data["amount"],
-                udyam_id=inv_data.get("udyam_id", ""),
-                buyer_contact=inv_data.get("buyer_contact", ""),
-                buyer_gstin=inv_data.get("buyer_gstin", ""),
-            )
-            inv.id = inv_data["id"]
-            if inv_data["paid"]:
-                inv.paid = True
-                inv.paid_date = inv_data.get("paid_date")
-            results.append(inv.to_dict())
-        except Exception:
-            results.append(inv_data)
-    return success(results)
+            after = _decode_cursor(args["cursor"])
+        except ValueError:
+            return error("Invalid cursor")
+
+    # Normalized so they compare correctly against the TEXT column
+    try:
+        date_from = normalize_date(args["from"]) if args.get("from") else None
+        date_to   = normalize_date(args["to"]) if args.get("to") else None
+    except ValueError:
+        return error("from/to must be in YYYY-MM-DD format")
+
+    # Status is computed, not stored — translate it into paid + date bounds
+    paid = None
+    status = (args.get("status") or "").strip().upper()
+    if status == STATUS_PAID:
+        paid = True
+    elif status:
+        if status not in STATUS_AGE_RANGES:
+            return error(f"Unknown status '{status}'")
+        paid = False
+        s_from, s_to = status_date_range(status)
+        date_from = max(filter(None, (date_from, s_from)), default=None)
+        date_to   = min(filter(None, (date_to, s_to)), default=None)
+
+    fields = [f.strip() for f in args.get("fields", "").split(",") if f.strip()]
+    fields = fields or list(INVOICE_COLUMNS + COMPUTED_FIELDS)
+    unknown = [f for f in fields if f not in INVOICE_COLUMNS + COMPUTED_FIELDS]
+    if unknown:
+        return error(f"Unknown fields: {', '.join(unknown)}")
+
+    wants_calc = any(f in COMPUTED_FIELDS for f in fields)
+    columns = {"id", "created_at"} | {f for f in fields if f in INVOICE_COLUMNS}
+    if wants_calc:
+        columns |= {"invoice_date", "amount", "paid"}
+
+    # Fetch one extra row to learn whether another page exists
+    rows = get_invoices_for_user(
+        user_id,
+        columns=",".join(sorted(columns)),
+        limit=limit + 1,
+        after=after,
+        paid=paid,
+        buyer=(args.get("buyer") or "").strip() or None,
+        date_from=date_from,
+        date_to=date_to,
+    )
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1])
+
+    if wants_calc and rows:
+        rows = _with_live_values(rows)
+
+    return success({
+        "invoices":    [{f: row.get(f) for f in fields} for row in rows],
+        "next_cursor": next_cursor,
+    })
 
 
 @app.route("/invoices/<invoice_id>", methods=["GET"])
@@ -304,9 +499,11 @@ def pay_invoice(invoice_id):
 @app.route("/invoices/<invoice_id>/send-notice", methods=["POST"])
 @jwt_required()
 def send_notice(invoice_id):
-    """Manually send a legal notice for an invoice (email and/or whatsapp)."""
-    from notifier import dispatch_notice
-
+    """
+    Manually send a legal notice for an invoice (email and/or whatsapp).
+    The notice is queued and sent in the background — poll
+    GET /notices/jobs/<job_id> for the outcome.
+    """
     user_id = int(get_jwt_identity())
     body    = request.get_json() or {}
 
@@ -356,30 +553,27 @@ def send_notice(invoice_id):
     except Exception:
         invoice_dict = inv
 
-    # Dispatch
-    results = dispatch_notice(invoice_dict, template_no, channels)
-
-    # Log each channel result to DB
-    sent_to = invoice_dict.get("buyer_contact", "unknown")
-    for channel, result in results.items():
-        status_str = "sent" if result.get("success") else "failed"
-        error_msg  = result.get("error") if not result.get("success") else None
-        log_notice(
-            invoice_id=inv["id"],
-            user_id=user_id,
-            notice_type=channel,
-            template_no=template_no,
-            sent_to=sent_to,
-            status=status_str,
-            error_msg=error_msg,
-        )
+    # Queue for background dispatch (retries + rate limits handled there)
+    job_id = enqueue_notice(user_id, inv["id"], invoice_dict, template_no, channels)
 
-    print(f"📬 Notice [{user_id}] Invoice {invoice_id} | Template {template_no} | {results}")
+    print(f"📬 Notice [{user_id}] Invoice {invoice_id} | Template {template_no} | queued as {job_id}")
     return success({
+        "job_id":      job_id,
+        "status":      "queued",
         "template_no": template_no,
         "channels":    channels,
-        "results":     results,
-    })
+    }, status=202)
+
+
+@app.route("/notices/jobs/<job_id>", methods=["GET"])
+@jwt_required()
+def notice_job_status(job_id):
+    """Status of a queued notice: queued | running | done | dead, plus per-channel results."""
+    user_id = int(get_jwt_identity())
+    job = get_job(job_id.upper(), user_id)
+    if not job:
+        return error(f"Notice job '{job_id}' not found", status=404)
+    return success(job)
 
 
 # ─────────────────────────────────────────────
@@ -469,7 +663,7 @@ def chat():
         return error("Question is too long (max 1000 chars)", status=400)
 
     if not rag_engine or not rag_engine.is_ready():
-        return error("Legal assistant is not available.", status=503)
+        return rag_unavailable()
 
     print(f"💬 Chat [{user_id}]: {question}")
     result = rag_engine.ask(question)
@@ -481,6 +675,44 @@ def chat():
     return success(result)
 
 
+@app.route("/chat/stream", methods=["POST"])
+@jwt_required()
+def chat_stream():
+    """
+    Streaming variant of /chat (Server-Sent Events).
+    Emits `sources` right after retrieval, then `token` events as the
+    LLM writes, then one `done` event with the full answer.
+    """
+    user_id = int(get_jwt_identity())
+    body = request.get_json()
+
+    if not body or not body.get("question"):
+        return error("Please provide a 'question' field", status=400)
+
+    question = body["question"].strip()
+    if len(question) < 3:
+        return error("Question is too short", status=400)
+    if len(question) > 1000:
+        return error("Question is too long (max 1000 chars)", status=400)
+
+    if not rag_engine or not rag_engine.is_ready():
+        return rag_unavailable()
+
+    print(f"💬 Chat stream [{user_id}]: {question}")
+
+    def events():
+        for event in rag_engine.ask(question, stream=True):
+            if event["type"] == "done" and event.get("success"):
+                save_chat_message(user_id, question, event["answer"], event.get("sources", []))
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.route("/chat/history", methods=["GET"])
 @jwt_required()
 def chat_history_route():
@@ -497,19 +729,117 @@ def clear_history_route():
     return success({"message": "Chat history cleared"})
 
 
+@app.route("/chat/status", methods=["GET"])
+def chat_status():
+    """Readiness of the legal assistant: loading (with stage/progress) | ready | failed."""
+    if rag_status["state"] == "ready":
+        return success({**rag_status, "cache": rag_engine.cache_stats()})
+    return success(rag_status)
+
+
 @app.route("/chat/suggestions", methods=["GET"])
 def chat_suggestions():
     from rag_engine import SUGGESTED_QUESTIONS
     return success({"suggestions": SUGGESTED_QUESTIONS})
 
 
+# ═════════════════════════════════════════════
+#  ADMIN (X-Admin-Token)
+# ═════════════════════════════════════════════
+
+def _is_admin():
+    token = request.headers.get("X-Admin-Token", "")
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+@app.route("/admin/reload-index", methods=["POST"])
+def admin_reload_index():
+    """
+    Swap in the current vectorstore/ build now instead of waiting for the
+    watcher. Chats keep being served from the old index while it loads.
+    """
+    if not _is_admin():
+        return error("Forbidden", status=403)
+    if not rag_engine:
+        return rag_unavailable()
+
+    result = rag_engine.reload_vectorstore()
+    if not result["reloaded"]:
+        return error(result["error"], status=409)
+    _rag_reloaded(result)
+    return success(result)
+
+
 # ═════════════════════════════════════════════
 #  OCR EXTRACT
 # ═════════════════════════════════════════════
 
+def _clean_value(text):
+    if not text:
+        return ""
+    if ":" in text:
+        return text.split(":", 1)[1].strip()
+    return text.strip()
+
+def _extract_amount(text):
+    if not text:
+        return 0
+    numbers = re.findall(r'[\d,]+\.?\d*', text)
+    if numbers:
+        return float(numbers[0].replace(',', ''))
+    return 0
+
+def _convert_date(text):
+    cleaned = _clean_value(text)
+    if not cleaned:
+        return ""
+    try:
+        return datetime.strptime(cleaned, "%d-%m-%Y").strftime("%Y-%m-%d")
+    except Exception:
+        return cleaned
+
+def _map_ocr_fields(fields: dict) -> dict:
+    """OCR service field names → invoice form fields."""
+    return {
+        "seller_name": _clean_value(fields.get("SELLER_NAME", "")),
+        "buyer_name": _clean_value(fields.get("BUYER_NAME", "")),
+        "invoice_no": _clean_value(fields.get("INVOICE_NUMBER", "")),
+        "invoice_date": _convert_date(fields.get("INVOICE_DATE", "")),
+        "amount": _extract_amount(fields.get("INVOICE_AMOUNT", "")),
+        "udyam_id": _clean_value(fields.get("UDYAM_ID", "")),
+        "buyer_gstin": _clean_value(fields.get("BUYER_GSTIN", "")),
+        "buyer_contact": _clean_value(fields.get("BUYER_EMAIL", "")),
+    }
+
+def _ocr_error(e):
+    resp, status = error(f"OCR extraction failed: {str(e)}", status=e.status)
+    if e.retry_after:
+        resp.headers["Retry-After"] = str(e.retry_after)
+    return resp, status
+
+
+# Async OCR job ids handed to clients are signed tokens carrying the OCR
+# service's job id and the owning user — any worker process can check
+# ownership, and nothing has to be stored or pruned here.
+OCR_JOB_TTL = int(os.environ.get("OCR_JOB_TTL", "3600"))
+_ocr_job_signer = URLSafeTimedSerializer(app.config["JWT_SECRET_KEY"], salt="ocr-job")
+
+def _ocr_job_owned(token, user_id):
+    """The OCR service job id behind a token, or None if it isn't this user's (or expired)."""
+    try:
+        claim = _ocr_job_signer.loads(token, max_age=OCR_JOB_TTL)
+    except BadSignature:
+        return None
+    return claim["job"] if claim.get("user") == user_id else None
+
 @app.route("/ocr/extract", methods=["POST"])
 @jwt_required()
 def ocr_extract():
+    """
+    Extract invoice fields from an uploaded PDF.
+    ?async=1 queues the whole PDF (every page) and returns a job id to poll
+    at /ocr/jobs/<job_id> — use it for large multi-page documents.
+    """
     if "file" not in request.files:
         return error("No file uploaded", status=400)
 
@@ -518,52 +848,44 @@ def ocr_extract():
         return error("Empty filename", status=400)
 
     try:
-        files = {"file": (file.filename, file.stream, file.content_type)}
-        ocr_response = requests.post(OCR_SERVICE_URL, files=files)
-        ocr_data = ocr_response.json()
-        fields = ocr_data.get("fields", {})
-
-        def clean_value(text):
-            if not text:
-                return ""
-            if ":" in text:
-                return text.split(":", 1)[1].strip()
-            return text.strip()
-
-        def extract_amount(text):
-            if not text:
-                return 0
-            numbers = re.findall(r'[\d,]+\.?\d*', text)
-            if numbers:
-                return float(numbers[0].replace(',', ''))
-            return 0
-
-        def convert_date(text):
-            cleaned = clean_value(text)
-            if not cleaned:
-                return ""
-            try:
-                return datetime.strptime(cleaned, "%d-%m-%Y").strftime("%Y-%m-%d")
-            except Exception:
-                return cleaned
-
-        mapped = {
-            "seller_name": clean_value(fields.get("SELLER_NAME", "")),
-            "buyer_name": clean_value(fields.get("BUYER_NAME", "")),
-            "invoice_no": clean_value(fields.get("INVOICE_NUMBER", "")),
-            "invoice_date": convert_date(fields.get("INVOICE_DATE", "")),
-            "amount": extract_amount(fields.get("INVOICE_AMOUNT", "")),
-            "udyam_id": clean_value(fields.get("UDYAM_ID", "")),
-            "buyer_gstin": clean_value(fields.get("BUYER_GSTIN", "")),
-            "buyer_contact": clean_value(fields.get("BUYER_EMAIL", "")),
-        }
-
-        return success(mapped)
+        if request.args.get("async") == "1":
+            job_id = ocr_client.submit_job(file.stream, file.filename)
+            token = _ocr_job_signer.dumps({"job": job_id, "user": get_jwt_identity()})
+            return success({"job_id": token, "status": "queued"}, status=202)
+
+        fields = ocr_client.extract(file.stream, file.filename)
+        return success(_map_ocr_fields(fields))
 
+    except ocr_client.OCRError as e:
+        return _ocr_error(e)
     except Exception as e:
         return error(f"OCR extraction failed: {str(e)}", status=500)
 
 
+@app.route("/ocr/jobs/<job_id>", methods=["GET"])
+@jwt_required()
+def ocr_job_status(job_id):
+    """Poll an async OCR job. When done, `invoices` holds one mapped invoice per page."""
+    service_job_id = _ocr_job_owned(job_id, get_jwt_identity())
+    if service_job_id is None:
+        return error("Job not found", status=404)
+
+    try:
+        job = ocr_client.get_job(service_job_id)
+    except ocr_client.OCRError as e:
+        return _ocr_error(e)
+
+    data = {"job_id": job_id, "status": job["status"]}
+    if job["status"] == "done":
+        data["invoices"] = [
+            {"page": doc.get("page"), **_map_ocr_fields(doc.get("fields", {}))}
+            for doc in job.get("documents", []) if doc.get("status") == "ok"
+        ]
+    elif job["status"] == "error":
+        data["error"] = job.get("message")
+    return success(data)
+
+
 # ═════════════════════════════════════════════
 #  SUMMARY (protected)
 # ═════════════════════════════════════════════
@@ -572,16 +894,14 @@ def ocr_extract():
 @jwt_required()
 def summary():
     user_id = int(get_jwt_identity())
-    invoices = get_invoices_for_user(user_id)
-    total = len(invoices)
-    overdue = sum(1 for i in invoices if not i["paid"])
-    paid = sum(1 for i in invoices if i["paid"])
-    total_amount = sum(i["amount"] for i in invoices)
+    agg = get_invoice_summary(user_id, PAYMENT_WINDOW_DAYS, DAILY_RATE)
     return success({
-        "total_invoices": total,
-        "overdue_count": overdue,
-        "paid_count": paid,
-        "total_principal": round(total_amount, 2),
+        "total_invoices": agg["total_invoices"],
+        "overdue_count": agg["unpaid_count"],
+        "past_due_count": agg["past_due_count"],
+        "paid_count": agg["paid_count"],
+        "total_principal": round(float(agg["total_principal"]), 2),
+        "total_interest": round(float(agg["total_interest"]), 2),
     })
 
 
@@ -605,5 +925,8 @@ if __name__ == "__main__":
     print("  GET  /chat/history                  → chat history")
     print("  DELETE /chat/history                → clear history")
     print("  POST /ocr/extract                   → OCR extract")
+    print("  GET  /ocr/jobs/<job_id>             → async OCR job status")
+    print("\n  Admin routes (X-Admin-Token):")
+    print("  POST /admin/reload-index            → hot-swap vector store")
     print("\n  Press CTRL+C to stop.\n")
     app.run(debug=True, port=5000)
@@ -1,20 +1,32 @@
 # ============================================================
-#  build_vectorstore.py  —  One-Time Knowledge Base Indexer
-#  Run this ONCE to build the FAISS vector store from legal docs.
+#  build_vectorstore.py  —  Incremental Knowledge Base Indexer
+#  Builds / updates the FAISS vector store from legal docs.
 #
 #  Usage:
-#    python build_vectorstore.py
+#    python build_vectorstore.py          # only re-embed what changed
+#    python build_vectorstore.py --full   # re-embed everything
 #
-#  Uses HuggingFace embeddings (100% local, no API key needed)
+#  vectorstore/manifest.json records each file's SHA-256 and chunk
+#  IDs. Unchanged files keep their vectors; chunks of changed files
+#  whose text is unchanged are reused too, so only new text is
+#  embedded. Chunks of deleted files simply aren't carried over.
+#  The new store is written to a temp dir, verified, then renamed
+#  into place — a running server never sees a half-written index.
+#
+#  Uses local embeddings (EMBEDDING_BACKEND, see embeddings.py)
 #  NO Gemini dependency!
 # ============================================================
 
 import os
 import sys
+import json
+import hashlib
+import shutil
+import numpy as np
 from langchain_community.document_loaders import TextLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
+from embeddings import EMBEDDING_MODEL, EMBEDDING_BACKEND, get_embeddings, embedding_signature
+from chunk_store import Chunk, VectorStore, has_store, write_store, publish_store
 
 # ─────────────────────────────────────────────────────────────
 #  CONFIGURATION
@@ -22,119 +34,215 @@ from langchain_community.vectorstores import FAISS
 
 KNOWLEDGE_DIR   = os.path.join(os.path.dirname(__file__), "knowledge_base")
 VECTORSTORE_DIR = os.path.join(os.path.dirname(__file__), "vectorstore")
-
-# Same embedding model as rag_engine.py — MUST match!
-EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+MANIFEST_FILE   = "manifest.json"
 
 # Chunking parameters
 CHUNK_SIZE    = 1000
 CHUNK_OVERLAP = 200
 
+# Stores built before the manifest existed always used this model
+LEGACY_EMBEDDING = EMBEDDING_MODEL
+
+
+def _splitter():
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        length_function=len,
+        separators=["\n\n", "\n", ". ", " ", ""],
+    )
+
+
+def _file_sha256(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
 
-def build_vectorstore():
-    """Build the FAISS vector store using local HuggingFace embeddings."""
 
-    # ── Step 1: Check knowledge_base folder ──
+def _text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _knowledge_files() -> list:
     if not os.path.exists(KNOWLEDGE_DIR):
         print(f"❌ ERROR: Knowledge base folder not found at {KNOWLEDGE_DIR}")
         sys.exit(1)
-
-    txt_files = [f for f in os.listdir(KNOWLEDGE_DIR) if f.endswith(".txt")]
+    txt_files = sorted(f for f in os.listdir(KNOWLEDGE_DIR) if f.endswith(".txt"))
     if not txt_files:
         print(f"❌ ERROR: No .txt files found in {KNOWLEDGE_DIR}")
         sys.exit(1)
+    return txt_files
 
-    print("=" * 55)
-    print("  Digital-Vakeel — Building Vector Store")
-    print("  (Using HuggingFace local embeddings)")
-    print("=" * 55)
-    print(f"\n📁 Knowledge base: {KNOWLEDGE_DIR}")
-    print(f"📄 Files found: {len(txt_files)}")
-    for f in txt_files:
-        size = os.path.getsize(os.path.join(KNOWLEDGE_DIR, f))
-        print(f"   - {f} ({size:,} bytes)")
-
-    # ── Step 2: Load documents ──
-    print(f"\n📖 Loading documents...")
-
-    documents = []
-    for filename in txt_files:
-        filepath = os.path.join(KNOWLEDGE_DIR, filename)
-        try:
-            loader = TextLoader(filepath, encoding="utf-8")
-            docs = loader.load()
-            documents.extend(docs)
-            print(f"   ✅ Loaded: {filename} ({len(docs)} document(s))")
-        except Exception as e:
-            print(f"   ❌ Failed to load {filename}: {e}")
-
-    if not documents:
-        print("❌ No documents loaded. Check file encoding (must be UTF-8).")
-        sys.exit(1)
-
-    print(f"\n   Total documents loaded: {len(documents)}")
 
-    # ── Step 3: Split into chunks ──
-    print(f"\n✂️  Splitting into chunks (size={CHUNK_SIZE}, overlap={CHUNK_OVERLAP})...")
+def split_file(filename: str) -> list:
+    """Load one knowledge base file and split it into chunks (Documents)."""
+    loader = TextLoader(os.path.join(KNOWLEDGE_DIR, filename), encoding="utf-8")
+    return _splitter().split_documents(loader.load())
 
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=CHUNK_SIZE,
-        chunk_overlap=CHUNK_OVERLAP,
-        length_function=len,
-        separators=["\n\n", "\n", ". ", " ", ""],
-    )
-
-    chunks = text_splitter.split_documents(documents)
-    print(f"   Total chunks created: {len(chunks)}")
 
-    if chunks:
-        print(f"\n   📝 Sample chunk (first 200 chars):")
-        print(f"   \"{chunks[0].page_content[:200]}...\"")
+def load_chunks():
+    """Load every knowledge base .txt file and split it into chunks."""
+    txt_files = _knowledge_files()
+    chunks = []
+    for filename in txt_files:
+        chunks.extend(split_file(filename))
+    return txt_files, chunks
 
-    # ── Step 4: Generate embeddings & build FAISS index ──
-    print(f"\n🧠 Generating embeddings with HuggingFace ({EMBEDDING_MODEL})...")
-    print(f"   This runs locally — no API calls needed!")
 
-    embeddings = HuggingFaceEmbeddings(
-        model_name=EMBEDDING_MODEL,
-        model_kwargs={"device": "cpu"},
-        encode_kwargs={"normalize_embeddings": True},
-    )
+# ─────────────────────────────────────────────────────────────
+#  PREVIOUS BUILD
+# ─────────────────────────────────────────────────────────────
 
-    vectorstore = FAISS.from_documents(chunks, embeddings)
-    print(f"   ✅ FAISS index built with {len(chunks)} vectors")
+def _load_previous(directory: str):
+    """
+    (manifest, VectorStore) of the current build, or ({}, None).
+    Vectors are only reusable if they came from the same embedding model.
+    """
+    if not has_store(directory):
+        return {}, None
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    if manifest.get("embedding", LEGACY_EMBEDDING) != embedding_signature():
+        print("   ♻️  Embedding model changed — re-embedding everything")
+        return {}, None
+    return manifest, VectorStore(directory)
 
-    # ── Step 5: Save to disk ──
-    print(f"\n💾 Saving vector store to {VECTORSTORE_DIR}...")
 
-    os.makedirs(VECTORSTORE_DIR, exist_ok=True)
-    vectorstore.save_local(VECTORSTORE_DIR)
+# ─────────────────────────────────────────────────────────────
+#  BUILD
+# ─────────────────────────────────────────────────────────────
 
-    print(f"   ✅ Saved successfully!")
+def build_vectorstore(full: bool = False):
+    """Build or incrementally update the FAISS vector store."""
+    txt_files = _knowledge_files()
 
-    # ── Step 6: Verify ──
-    print(f"\n🔍 Verifying vector store...")
+    print("=" * 55)
+    print("  Digital-Vakeel — Building Vector Store")
+    print(f"  (Using local embeddings: {EMBEDDING_BACKEND})")
+    print("=" * 55)
+    print(f"\n📁 Knowledge base: {KNOWLEDGE_DIR}")
 
-    test_store = FAISS.load_local(
-        VECTORSTORE_DIR,
-        embeddings,
-        allow_dangerous_deserialization=True,
-    )
-    test_results = test_store.similarity_search("What is Section 16?", k=2)
+    # ── Step 1: Compare files with the last build ──
+    manifest, previous = ({}, None) if full else _load_previous(VECTORSTORE_DIR)
+    old_files = manifest.get("files", {})
+    settings = {"chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP}
+    same_settings = manifest.get("settings") == settings
+
+    hashes = {f: _file_sha256(os.path.join(KNOWLEDGE_DIR, f)) for f in txt_files}
+    unchanged = [f for f in txt_files
+                 if same_settings and old_files.get(f, {}).get("sha256") == hashes[f]]
+    changed = [f for f in txt_files if f not in unchanged]
+    removed = [f for f in old_files if f not in hashes]
+
+    print(f"📄 Files: {len(txt_files)} | unchanged {len(unchanged)} | "
+          f"new/changed {len(changed)} | removed {len(removed)}")
+    for f in changed:
+        print(f"   ✏️  {f}")
+    for f in removed:
+        print(f"   🗑️  {f}")
+
+    if previous is not None and not changed and not removed:
+        print("\n✅ Vector store is up to date — nothing to do.")
+        return
+
+    # ── Step 2: Collect chunks, reusing vectors where possible ──
+    rows_by_id, rows_by_text = {}, {}
+    if previous is not None:
+        for row, chunk in enumerate(previous.chunks):
+            rows_by_id[chunk.id] = row
+            rows_by_text.setdefault(_text_key(chunk.page_content), row)
+
+    chunks, sources = [], []      # sources[i]: previous row, or None = embed
+    files = {}
+    print(f"\n✂️  Splitting changed files (size={CHUNK_SIZE}, overlap={CHUNK_OVERLAP})...")
+    for filename in txt_files:
+        ids = []
+        if filename in unchanged:
+            for chunk_id in old_files[filename]["chunks"]:
+                row = rows_by_id[chunk_id]
+                chunks.append(previous.chunks[row])
+                sources.append(row)
+                ids.append(chunk_id)
+        else:
+            try:
+                docs = split_file(filename)
+            except Exception as e:
+                print(f"   ❌ Failed to load {filename}: {e}")
+                continue
+            for i, doc in enumerate(docs):
+                chunk_id = f"{hashes[filename][:12]}-{i}"
+                chunks.append(Chunk(chunk_id, doc.page_content, doc.metadata))
+                sources.append(rows_by_text.get(_text_key(doc.page_content)))
+                ids.append(chunk_id)
+            print(f"   ✅ {filename}: {len(docs)} chunk(s)")
+        files[filename] = {"sha256": hashes[filename], "chunks": ids}
+
+    if not chunks:
+        print("❌ No chunks produced. Check file encoding (must be UTF-8).")
+        sys.exit(1)
 
-    print(f"   ✅ Verification passed! Test query returned {len(test_results)} results")
-    print(f"\n   Test query: 'What is Section 16?'")
-    for i, doc in enumerate(test_results):
-        source = os.path.basename(doc.metadata.get("source", "unknown"))
-        print(f"   Result {i+1} ({source}): \"{doc.page_content[:100]}...\"")
+    # ── Step 3: Embed only the new text ──
+    import faiss
+    todo = [i for i, src in enumerate(sources) if src is None]
+    print(f"\n🧠 Embedding {len(todo)} new chunk(s), reusing {len(chunks) - len(todo)} "
+          f"({EMBEDDING_BACKEND}, {EMBEDDING_MODEL})...")
+
+    embeddings = None
+    fresh = np.zeros((0, 0), dtype=np.float32)
+    if todo:
+        embeddings = get_embeddings()
+        fresh = np.asarray(embeddings.embed_documents([chunks[i].page_content for i in todo]),
+                           dtype=np.float32)
+
+    dim = fresh.shape[1] if todo else previous.index.d
+    vectors = np.empty((len(chunks), dim), dtype=np.float32)
+    for j, i in enumerate(todo):
+        vectors[i] = fresh[j]
+    for i, src in enumerate(sources):
+        if src is not None:
+            vectors[i] = previous.index.reconstruct(src)
+
+    index = faiss.IndexFlatL2(dim)
+    index.add(vectors)
+    print(f"   ✅ FAISS index built with {index.ntotal} vectors")
+
+    # ── Step 4: Write to a temp dir and verify ──
+    tmp_dir = f"{VECTORSTORE_DIR}.tmp-{os.getpid()}"
+    try:
+        print(f"\n💾 Writing new build to {tmp_dir}...")
+        write_store(tmp_dir, index, chunks)
+        with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump({"embedding": embedding_signature(), "settings": settings, "files": files}, f, indent=2)
+
+        print(f"\n🔍 Verifying vector store...")
+        test_store = VectorStore(tmp_dir)
+        probe = vectors[0] if embeddings is None else embeddings.embed_query("What is Section 16?")
+        test_results = test_store.similarity_search_by_vector(probe, k=2)
+        test_store.close()
+        if not test_results:
+            print("❌ Verification failed — keeping the current vector store.")
+            sys.exit(1)
+        print(f"   ✅ Verification passed! Test query returned {len(test_results)} results")
+
+        # ── Step 5: Publish atomically ──
+        if previous is not None:
+            previous.close()
+        publish_store(tmp_dir, VECTORSTORE_DIR)
+    finally:
+        # Once published tmp_dir no longer exists; on any failure this
+        # removes the half-built copy instead of leaking it
+        shutil.rmtree(tmp_dir, ignore_errors=True)
 
     print(f"\n{'=' * 55}")
     print(f"  ✅ Vector store built successfully!")
-    print(f"  📊 {len(chunks)} chunks indexed from {len(txt_files)} documents")
+    print(f"  📊 {len(chunks)} chunks indexed from {len(files)} documents "
+          f"({len(todo)} embedded)")
     print(f"  📁 Saved to: {VECTORSTORE_DIR}")
-    print(f"  🚀 You can now start the Flask server!")
+    print(f"  🚀 Running servers pick it up on reload (or restart)")
     print(f"{'=' * 55}")
 
 
 if __name__ == "__main__":
-    build_vectorstore()
+    build_vectorstore(full="--full" in sys.argv)
@@ -0,0 +1,183 @@
+# ============================================================
+#  chunk_store.py  —  Digital-Vakeel Memory-Mapped Vector Store
+#  Replaces LangChain's pickled docstore (index.pkl), which every
+#  worker process had to unpickle into its own Python objects.
+#
+#  vectorstore/
+#    index.faiss     FAISS index — row i is chunk i; opened with
+#                    mmap flags so workers share it via the page cache
+#    chunks.bin      chunk records (UTF-8 JSON: id, text, metadata),
+#                    written back to back; mmap'd, decoded on demand
+#    chunks.idx.npy  int64 byte offsets into chunks.bin (N + 1 entries)
+#
+#  No pickle is involved in loading. Convert an old pickle-based
+#  store once with:   python chunk_store.py convert
+# ============================================================
+
+import os
+import sys
+import json
+import mmap
+import shutil
+from collections import namedtuple
+
+import numpy as np
+
+INDEX_FILE   = "index.faiss"
+CHUNKS_FILE  = "chunks.bin"
+OFFSETS_FILE = "chunks.idx.npy"
+
+# Same attribute names as a LangChain Document, so callers don't change
+Chunk = namedtuple("Chunk", "id page_content metadata")
+
+
+def has_store(directory: str) -> bool:
+    """True if directory holds a complete memory-mapped store."""
+    return all(os.path.exists(os.path.join(directory, f))
+               for f in (INDEX_FILE, CHUNKS_FILE, OFFSETS_FILE))
+
+
+# ─────────────────────────────────────────────────────────────
+#  WRITE
+# ─────────────────────────────────────────────────────────────
+
+def write_store(directory: str, index, chunks: list):
+    """
+    Save a FAISS index and its chunks (list of Chunk, in index row order).
+    """
+    import faiss
+    if index.ntotal != len(chunks):
+        raise ValueError(f"Index has {index.ntotal} vectors but {len(chunks)} chunks were given")
+
+    os.makedirs(directory, exist_ok=True)
+    offsets = [0]
+    with open(os.path.join(directory, CHUNKS_FILE), "wb") as f:
+        for chunk in chunks:
+            record = json.dumps(
+                {"id": chunk.id, "text": chunk.page_content, "metadata": chunk.metadata},
+                ensure_ascii=False,
+            ).encode("utf-8")
+            f.write(record)
+            offsets.append(offsets[-1] + len(record))
+    np.save(os.path.join(directory, OFFSETS_FILE), np.asarray(offsets, dtype=np.int64))
+    faiss.write_index(index, os.path.join(directory, INDEX_FILE))
+
+
+def publish_store(build_dir: str, target_dir: str):
+    """
+    Move a finished build into place with directory renames, so readers
+    see either the old store or the new one, never a partly written mix.
+    (Between the two renames target_dir briefly doesn't exist; readers
+    treat that as "no new store yet".)
+    """
+    old_dir = target_dir + ".old"
+    if os.path.exists(old_dir):
+        shutil.rmtree(old_dir)
+    if os.path.exists(target_dir):
+        os.rename(target_dir, old_dir)
+    os.rename(build_dir, target_dir)
+    # Open mmaps of the old files stay valid on POSIX until closed
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+# ─────────────────────────────────────────────────────────────
+#  READ
+# ─────────────────────────────────────────────────────────────
+
+class ChunkStore:
+    """Read-only, memory-mapped chunk records addressed by row number."""
+
+    def __init__(self, directory: str):
+        self.offsets = np.load(os.path.join(directory, OFFSETS_FILE), mmap_mode="r")
+        with open(os.path.join(directory, CHUNKS_FILE), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            # mmap can't map an empty file
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> Chunk:
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        record = json.loads(self._data[start:end].decode("utf-8"))
+        return Chunk(record["id"], record["text"], record["metadata"])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+
+def _read_index(path: str):
+    """Open a FAISS index memory-mapped when this faiss build supports it."""
+    import faiss
+    flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+    try:
+        return faiss.read_index(path, flags)
+    except RuntimeError:
+        return faiss.read_index(path)
+
+
+class VectorStore:
+    """
+    FAISS index + chunk store. similarity_search_by_vector() matches the
+    LangChain FAISS method rag_engine.py already used.
+    """
+
+    def __init__(self, directory: str, embeddings=None):
+        if not has_store(directory):
+            raise FileNotFoundError(f"No memory-mapped vector store in {directory}")
+        self.directory  = directory
+        self.embeddings = embeddings
+        self.index      = _read_index(os.path.join(directory, INDEX_FILE))
+        self.chunks     = ChunkStore(directory)
+        if self.index.ntotal != len(self.chunks):
+            raise ValueError(f"Index has {self.index.ntotal} vectors but {len(self.chunks)} chunks")
+
+    def similarity_search_by_vector(self, embedding, k: int = 4) -> list:
+        query = np.asarray(embedding, dtype=np.float32).reshape(1, -1)
+        _, rows = self.index.search(query, min(k, self.index.ntotal))
+        return [self.chunks[int(i)] for i in rows[0] if i >= 0]
+
+    def similarity_search(self, query: str, k: int = 4) -> list:
+        return self.similarity_search_by_vector(self.embeddings.embed_query(query), k)
+
+    def close(self):
+        self.chunks.close()
+
+
+# ─────────────────────────────────────────────────────────────
+#  ONE-TIME MIGRATION FROM index.pkl
+# ─────────────────────────────────────────────────────────────
+
+def convert_pickle_store(directory: str):
+    """
+    Rewrite a LangChain FAISS store (index.faiss + index.pkl) in this
+    format. Only unpickles the repo's own index.pkl, once, offline.
+    """
+    import pickle
+    import faiss
+
+    with open(os.path.join(directory, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    index = faiss.read_index(os.path.join(directory, INDEX_FILE))
+
+    chunks = []
+    for row in range(index.ntotal):
+        doc_id = index_to_docstore_id[row]
+        doc = docstore.search(doc_id)
+        chunks.append(Chunk(doc_id, doc.page_content, doc.metadata))
+    write_store(directory, index, chunks)
+    os.remove(os.path.join(directory, "index.pkl"))
+    print(f"✅ Converted {len(chunks)} chunks in {directory} (index.pkl removed)")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "convert":
+        convert_pickle_store(sys.argv[2] if len(sys.argv) > 2 else
+                             os.path.join(os.path.dirname(__file__), "vectorstore"))
+    else:
+        print("Usage: python chunk_store.py convert [vectorstore_dir]")
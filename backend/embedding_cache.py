@@ -0,0 +1,129 @@
+# ============================================================
+#  embedding_cache.py  —  Digital-Vakeel Query Embedding Cache
+#  Skips the MiniLM forward pass for questions we've seen before
+#  (repeats, suggested questions, retries).
+#
+#  • In-process LRU of normalized question → float32 vector,
+#    bounded at EMBEDDING_CACHE_SIZE entries, safe across threads
+#  • Optional SQLite store (EMBEDDING_CACHE_DB) so vectors survive
+#    restarts, trimmed to the same EMBEDDING_CACHE_SIZE per model;
+#    entries are keyed by embedding model as well, so a model change
+#    never serves stale vectors
+# ============================================================
+
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from answer_cache import normalize_question
+
+# ─────────────────────────────────────────────────────────────
+#  CONFIGURATION
+# ─────────────────────────────────────────────────────────────
+
+MAX_ENTRIES = int(os.environ.get("EMBEDDING_CACHE_SIZE", "2000"))
+CACHE_DB    = os.environ.get("EMBEDDING_CACHE_DB", "")   # empty = memory only
+
+
+class EmbeddingCache:
+    """Thread-safe LRU of question embeddings with an optional SQLite backing store."""
+
+    def __init__(self, model: str, max_entries: int = MAX_ENTRIES, path: str = CACHE_DB):
+        self.model       = model
+        self.max_entries = max_entries
+        self.path        = path
+        self._lock       = threading.Lock()
+        self._vectors    = OrderedDict()   # normalized question → float32 vector
+        self._db         = None
+        self.hits        = 0
+        self.misses      = 0
+        if path:
+            self._open()
+
+    # ── persistence ──
+
+    def _open(self):
+        try:
+            self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " model TEXT NOT NULL, question TEXT NOT NULL, vector BLOB NOT NULL,"
+                " PRIMARY KEY (model, question))"
+            )
+            # Warm the LRU with the most recently stored vectors
+            rows = self._db.execute(
+                "SELECT question, vector FROM embeddings WHERE model = ?"
+                " ORDER BY rowid DESC LIMIT ?", (self.model, self.max_entries),
+            ).fetchall()
+            for question, blob in reversed(rows):
+                self._vectors[question] = np.frombuffer(blob, dtype=np.float32)
+        except Exception as e:
+            print(f"   ⚠️  Embedding cache store unavailable, memory only: {e}")
+            self._db = None
+
+    def _store(self, key, vector):
+        """Persist one vector. Caller holds the lock."""
+        if self._db is None:
+            return
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO embeddings (model, question, vector) VALUES (?, ?, ?)",
+                (self.model, key, vector.tobytes()),
+            )
+            # Same bound as the LRU: keep only the newest max_entries rows
+            self._db.execute(
+                "DELETE FROM embeddings WHERE model = ? AND rowid NOT IN ("
+                " SELECT rowid FROM embeddings WHERE model = ? ORDER BY rowid DESC LIMIT ?)",
+                (self.model, self.model, self.max_entries),
+            )
+        except Exception as e:
+            print(f"   ⚠️  Embedding cache write failed: {e}")
+
+    # ── lookup / insert ──
+
+    def get(self, question: str):
+        """Cached float32 vector for the question, or None."""
+        key = normalize_question(question)
+        with self._lock:
+            vector = self._vectors.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._vectors.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, question: str, vector) -> np.ndarray:
+        """Cache a vector (stored as float32) and return it."""
+        key = normalize_question(question)
+        vector = np.asarray(vector, dtype=np.float32)
+        vector.setflags(write=False)   # shared between threads — never mutate
+        with self._lock:
+            self._vectors[key] = vector
+            self._vectors.move_to_end(key)
+            while len(self._vectors) > self.max_entries:
+                self._vectors.popitem(last=False)
+            self._store(key, vector)
+        return vector
+
+    def embed(self, question: str, embed_fn) -> np.ndarray:
+        """Cached vector, or embed_fn(question) stored for next time."""
+        vector = self.get(question)
+        if vector is None:
+            vector = self.put(question, embed_fn(question))
+        return vector
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries":   len(self._vectors),
+                "hits":      self.hits,
+                "misses":    self.misses,
+                "hit_rate":  round(self.hits / total, 3) if total else 0.0,
+                "persisted": self._db is not None,
+            }
@@ -0,0 +1,191 @@
+# ============================================================
+#  embeddings.py  —  Digital-Vakeel Embedding Backends
+#  One place that decides how text becomes vectors, shared by
+#  rag_engine.py and build_vectorstore.py (so they always match).
+#
+#  Backends (EMBEDDING_BACKEND):
+#    huggingface  sentence-transformers + torch, fp32 (default)
+#    onnx         the same all-MiniLM-L6-v2 exported to ONNX and
+#                 int8-quantized, run with ONNX Runtime — no torch
+#                 import, less memory, faster CPU inference
+#
+#  The ONNX model is produced once, then checked against the
+#  HuggingFace vectors so the existing FAISS index stays valid:
+#    python embeddings.py export     # needs torch + transformers
+#    python embeddings.py verify     # cosine vs HuggingFace on the KB
+# ============================================================
+
+import os
+import sys
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# ─────────────────────────────────────────────────────────────
+#  CONFIGURATION
+# ─────────────────────────────────────────────────────────────
+
+EMBEDDING_MODEL   = "all-MiniLM-L6-v2"   # small, fast, accurate
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "huggingface")
+ONNX_DIR          = os.environ.get("EMBEDDING_ONNX_DIR",
+                                   os.path.join(os.path.dirname(__file__), "models", "minilm-onnx"))
+ONNX_THREADS      = int(os.environ.get("EMBEDDING_THREADS", "0"))   # 0 = onnxruntime default
+MAX_SEQ_LENGTH    = 256      # same truncation as sentence-transformers' MiniLM
+BATCH_SIZE        = 32
+MIN_COSINE        = 0.99     # verify(): worst-case similarity to the fp32 vectors
+
+
+# ─────────────────────────────────────────────────────────────
+#  ONNX RUNTIME BACKEND
+# ─────────────────────────────────────────────────────────────
+
+class OnnxEmbeddings(Embeddings):
+    """
+    all-MiniLM-L6-v2 on ONNX Runtime: tokenize → transformer → mean
+    pooling over real tokens → L2 normalize (what sentence-transformers
+    does with normalize_embeddings=True).
+    """
+
+    def __init__(self, model_dir: str = ONNX_DIR, threads: int = ONNX_THREADS):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path = os.path.join(model_dir, "model_int8.onnx")
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"ONNX embedding model not found at {model_path}. Run: python embeddings.py export"
+            )
+
+        options = ort.SessionOptions()
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+
+    def _embed(self, texts: list) -> np.ndarray:
+        vectors = []
+        for i in range(0, len(texts), BATCH_SIZE):
+            encoded = self.tokenizer.encode_batch(texts[i:i + BATCH_SIZE])
+            inputs = {
+                "input_ids":      np.array([e.ids for e in encoded], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encoded], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in encoded], dtype=np.int64),
+            }
+            inputs = {k: v for k, v in inputs.items() if k in self.input_names}
+            hidden = self.session.run(None, inputs)[0]            # (batch, tokens, 384)
+
+            mask = inputs["attention_mask"][:, :, None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            vectors.append(pooled.astype(np.float32))
+        return np.vstack(vectors) if vectors else np.zeros((0, 384), dtype=np.float32)
+
+    def embed_documents(self, texts: list) -> list:
+        return self._embed(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> list:
+        return self._embed([text])[0].tolist()
+
+
+# ─────────────────────────────────────────────────────────────
+#  FACTORY
+# ─────────────────────────────────────────────────────────────
+
+def _huggingface():
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL,
+        model_kwargs={"device": "cpu"},
+        encode_kwargs={"normalize_embeddings": True},
+    )
+
+BACKENDS = {
+    "huggingface": _huggingface,
+    "onnx":        OnnxEmbeddings,
+}
+
+def get_embeddings(backend: str = None) -> Embeddings:
+    """The configured embedding backend (EMBEDDING_BACKEND)."""
+    backend = backend or EMBEDDING_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}'. Available: {', '.join(BACKENDS)}")
+    return BACKENDS[backend]()
+
+def embedding_signature(backend: str = None) -> str:
+    """Model + backend id, e.g. 'all-MiniLM-L6-v2+onnx-int8' (embedding cache key)."""
+    backend = backend or EMBEDDING_BACKEND
+    return EMBEDDING_MODEL + ("+onnx-int8" if backend == "onnx" else "")
+
+
+# ─────────────────────────────────────────────────────────────
+#  EXPORT / VERIFY (one-time, on a machine with torch)
+# ─────────────────────────────────────────────────────────────
+
+def export_onnx(model_dir: str = ONNX_DIR):
+    """Export all-MiniLM-L6-v2 to ONNX and quantize its weights to int8."""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    os.makedirs(model_dir, exist_ok=True)
+    name = f"sentence-transformers/{EMBEDDING_MODEL}"
+    tokenizer = AutoTokenizer.from_pretrained(name)
+    model = AutoModel.from_pretrained(name).eval()
+    tokenizer.save_pretrained(model_dir)   # writes tokenizer.json
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    fp32_path = os.path.join(model_dir, "model.onnx")
+    axes = {0: "batch", 1: "tokens"}
+    torch.onnx.export(
+        model,
+        (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+        fp32_path,
+        input_names=["input_ids", "attention_mask", "token_type_ids"],
+        output_names=["last_hidden_state"],
+        dynamic_axes={"input_ids": axes, "attention_mask": axes,
+                      "token_type_ids": axes, "last_hidden_state": axes},
+        opset_version=17,
+    )
+    quantize_dynamic(fp32_path, os.path.join(model_dir, "model_int8.onnx"), weight_type=QuantType.QInt8)
+    print(f"✅ ONNX model exported to {model_dir}")
+
+
+def verify(texts: list, min_cosine: float = MIN_COSINE) -> bool:
+    """Compare ONNX int8 vectors with the HuggingFace ones; print similarity and speed."""
+    reference, candidate = _huggingface(), OnnxEmbeddings()
+
+    timings = {}
+    vectors = {}
+    for name, backend in (("huggingface", reference), ("onnx", candidate)):
+        backend.embed_query("warm up")
+        started = time.perf_counter()
+        vectors[name] = np.asarray(backend.embed_documents(texts), dtype=np.float32)
+        for text in texts[:50]:
+            backend.embed_query(text)
+        timings[name] = (time.perf_counter() - started) * 1000
+
+    cosines = (vectors["huggingface"] * vectors["onnx"]).sum(axis=1)
+    print(f"   {len(texts)} texts | cosine min {cosines.min():.4f} mean {cosines.mean():.4f}")
+    for name, ms in timings.items():
+        print(f"   {name:<12} {ms:8.0f} ms")
+    ok = bool(cosines.min() >= min_cosine)
+    print(f"   {'✅' if ok else '❌'} tolerance: cosine ≥ {min_cosine}")
+    return ok
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "export":
+        export_onnx()
+    elif command == "verify":
+        from build_vectorstore import load_chunks
+        _, chunks = load_chunks()
+        chunks = [c.page_content for c in chunks]
+        sys.exit(0 if verify(chunks) else 1)
+    else:
+        print("Usage: python embeddings.py export | verify")
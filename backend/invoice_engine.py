@@ -10,6 +10,7 @@ from typing import Optional
 import uuid
 import json
 import os
+import numpy as np
 
 # ─────────────────────────────────────────────────────────────
 #  CONSTANTS  (from Person A's legal document)
@@ -30,11 +31,34 @@ STATUS_NOTICE_SENT   = "LEGAL NOTICE SENT"# Day 60–66: formal notice dispatche
 STATUS_ESCALATION    = "ESCALATION"       # Day 67+: portal filing imminent
 STATUS_PAID          = "PAID"             # Buyer confirmed payment
 
+# Integer codes for the batch engine — index into this tuple to get the string
+STATUS_CODES = (
+    STATUS_ACTIVE,        # 0
+    STATUS_DUE_SOON,      # 1
+    STATUS_DUE_TODAY,     # 2
+    STATUS_OVERDUE,       # 3
+    STATUS_NOTICE_SENT,   # 4
+    STATUS_ESCALATION,    # 5
+    STATUS_PAID,          # 6
+)
+
 # Trigger days — Person C uses these to fire messages
 TRIGGER_WHATSAPP     = 46   # Template 1: soft WhatsApp reminder
 TRIGGER_LEGAL_EMAIL  = 60   # Template 2: formal legal notice email
 TRIGGER_FINAL_NOTICE = 67   # Template 3: final escalation warning
 
+# Invoice age (days since invoice_date) covered by each unpaid status,
+# as inclusive (min_age, max_age) — None means unbounded.
+# Mirrors determine_status(), so status filters can run in the database.
+STATUS_AGE_RANGES = {
+    STATUS_ACTIVE:      (None,                    PAYMENT_WINDOW_DAYS - 6),
+    STATUS_DUE_SOON:    (PAYMENT_WINDOW_DAYS - 5, PAYMENT_WINDOW_DAYS - 1),
+    STATUS_DUE_TODAY:   (PAYMENT_WINDOW_DAYS,     PAYMENT_WINDOW_DAYS),
+    STATUS_OVERDUE:     (PAYMENT_WINDOW_DAYS + 1, TRIGGER_LEGAL_EMAIL - 1),
+    STATUS_NOTICE_SENT: (TRIGGER_LEGAL_EMAIL,     TRIGGER_FINAL_NOTICE - 1),
+    STATUS_ESCALATION:  (TRIGGER_FINAL_NOTICE,    None),
+}
+
 
 # ─────────────────────────────────────────────────────────────
 #  DATA MODEL  — what one invoice looks like
@@ -91,6 +115,16 @@ class Invoice:
 #  STEP 1 — DATE LOGIC
 # ─────────────────────────────────────────────────────────────
 
+def normalize_date(value) -> str:
+    """
+    Canonical zero-padded "YYYY-MM-DD" for a date string.
+    strptime also accepts "2025-1-5"; storing that as-is would break
+    string comparisons (range filters, milestone matching) on the column.
+    Raises ValueError if the value isn't a Y-M-D date.
+    """
+    return datetime.strptime(str(value).strip(), "%Y-%m-%d").strftime("%Y-%m-%d")
+
+
 def calculate_dates(invoice: Invoice) -> dict:
     """
     Given an invoice, work out all the important dates and day counts.
@@ -246,6 +280,104 @@ def calculate(invoice: Invoice) -> Invoice:
     return invoice
 
 
+# ─────────────────────────────────────────────────────────────
+#  STEP 4b — BATCH CALCULATE (columnar, vectorized with NumPy)
+#  Same rules as calculate(), but for thousands of invoices at once.
+#  Dashboards use this instead of building one Invoice per row.
+# ─────────────────────────────────────────────────────────────
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def date_ordinals(iso_dates) -> np.ndarray:
+    """
+    Convert a list of "YYYY-MM-DD" strings into an int64 array of
+    date ordinals (same numbers as date.toordinal()).
+    NumPy parses the whole column in one go — no per-row strptime.
+    Rows stored before dates were normalized ("2025-1-5") are re-parsed
+    one by one; a value that isn't a date at all raises ValueError.
+    """
+    try:
+        days = np.asarray(iso_dates, dtype="datetime64[D]")
+    except ValueError:
+        days = np.asarray([normalize_date(d) for d in iso_dates], dtype="datetime64[D]")
+    if np.isnat(days).any():
+        raise ValueError("Missing invoice date")
+    return days.astype(np.int64) + _EPOCH_ORDINAL
+
+
+def calculate_batch(invoice_ordinals, amounts, paid, today: Optional[date] = None) -> dict:
+    """
+    Vectorized version of calculate() for a whole portfolio.
+
+    Args:
+        invoice_ordinals : invoice dates as ordinals (see date_ordinals())
+        amounts          : principal amounts in rupees
+        paid             : paid flags (truthy = paid)
+        today            : reference date (defaults to date.today())
+
+    Returns dict of NumPy arrays, one entry per invoice:
+      - due_date         : due date as an ordinal (invoice date + 45)
+      - days_overdue     : days past the deadline (0 if not yet overdue)
+      - days_until_due   : days remaining before overdue
+      - status_code      : index into STATUS_CODES
+      - interest_accrued : statutory interest, rounded to the paisa
+      - total_due        : principal + interest
+
+    Paid rows match calculate(): status PAID and all counters frozen at 0.
+    """
+    ordinals = np.asarray(invoice_ordinals, dtype=np.int64)
+    amounts  = np.asarray(amounts, dtype=np.float64)
+    paid     = np.asarray(paid, dtype=bool)
+    today    = today or date.today()
+
+    # Step 1: dates
+    due       = ordinals + PAYMENT_WINDOW_DAYS
+    diff_days = today.toordinal() - due
+    days_overdue   = np.where(paid, 0, np.maximum(diff_days, 0))
+    days_until_due = np.where(paid, 0, np.maximum(-diff_days, 0))
+
+    # Step 2: status (same order of checks as determine_status)
+    status_code = np.select(
+        [
+            paid,
+            days_overdue >= (TRIGGER_FINAL_NOTICE - PAYMENT_WINDOW_DAYS),
+            days_overdue >= (TRIGGER_LEGAL_EMAIL - PAYMENT_WINDOW_DAYS),
+            days_overdue >= 1,
+            days_until_due == 0,
+            days_until_due <= 5,
+        ],
+        [6, 5, 4, 3, 2, 1],
+        default=0,
+    ).astype(np.int8)
+
+    # Step 3: interest
+    interest  = np.round(amounts * DAILY_RATE * days_overdue, 2)
+    total_due = np.where(paid, 0.0, np.round(amounts + interest, 2))
+
+    return {
+        "due_date":         due,
+        "days_overdue":     days_overdue,
+        "days_until_due":   days_until_due,
+        "status_code":      status_code,
+        "interest_accrued": interest,
+        "total_due":        total_due,
+    }
+
+
+def status_date_range(status: str, today: Optional[date] = None) -> tuple:
+    """
+    Return the (date_from, date_to) invoice_date bounds — inclusive
+    "YYYY-MM-DD" strings, None if unbounded — of unpaid invoices that
+    currently have this status. Raises KeyError for PAID/unknown status.
+    """
+    today = today or date.today()
+    min_age, max_age = STATUS_AGE_RANGES[status]
+    date_from = (today - timedelta(days=max_age)).isoformat() if max_age is not None else None
+    date_to   = (today - timedelta(days=min_age)).isoformat() if min_age is not None else None
+    return date_from, date_to
+
+
 # ─────────────────────────────────────────────────────────────
 #  STEP 5 — NOTIFICATION TRIGGER CHECKER
 #  Person C uses this to know which messages to send
@@ -462,6 +594,50 @@ if __name__ == "__main__":
     print(f"  Triggers     : {triggers}")
     print("  ✅ PASS")
 
+    # Test 6: Batch engine agrees with the per-invoice path
+    ages  = [0, 40, 45, 46, 60, 67, 120, 65]
+    batch_invs = [
+        Invoice(
+            seller_name  = "Arjun Textiles",
+            buyer_name   = "Mega-Retail Corp",
+            invoice_no   = f"INV-2025-2{i:02d}",
+            invoice_date = (date.today() - timedelta(days=age)).isoformat(),
+            amount       = 125000.5 * (i + 1),
+            paid         = (i == len(ages) - 1),
+        )
+        for i, age in enumerate(ages)
+    ]
+    batch = calculate_batch(
+        date_ordinals([inv.invoice_date for inv in batch_invs]),
+        [inv.amount for inv in batch_invs],
+        [inv.paid for inv in batch_invs],
+    )
+    print(f"\n[TEST 6] Batch calculate ({len(batch_invs)} invoices)")
+    for i, inv in enumerate(batch_invs):
+        inv = calculate(inv)
+        assert STATUS_CODES[batch["status_code"][i]] == inv.status
+        assert batch["days_overdue"][i]    == inv.days_overdue
+        assert batch["days_until_due"][i]  == inv.days_until_due
+        assert abs(batch["interest_accrued"][i] - inv.interest_accrued) < 0.01
+        assert abs(batch["total_due"][i] - inv.total_due) < 0.01
+    print(f"  Statuses : {[STATUS_CODES[c] for c in batch['status_code']]}")
+    print("  ✅ PASS")
+
+    # Test 7: Status → invoice_date range agrees with the status engine
+    print(f"\n[TEST 7] Status date ranges")
+    for age in range(0, 100):
+        inv = calculate(Invoice(
+            seller_name  = "Arjun Textiles",
+            buyer_name   = "Mega-Retail Corp",
+            invoice_no   = "INV-2025-300",
+            invoice_date = (date.today() - timedelta(days=age)).isoformat(),
+            amount       = 1000,
+        ))
+        date_from, date_to = status_date_range(inv.status)
+        assert (date_from is None or inv.invoice_date >= date_from)
+        assert (date_to   is None or inv.invoice_date <= date_to)
+    print("  ✅ PASS")
+
     print("\n" + "=" * 55)
     print("  All tests passed! Engine is ready.")
     print("=" * 55)
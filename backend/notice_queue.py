@@ -0,0 +1,349 @@
+# ============================================================
+#  notice_queue.py  —  Digital-Vakeel Outbound Notice Queue
+#  Durable local job queue (SQLite) for legal notice dispatch.
+#
+#  Flow:
+#    1. /send-notice calls enqueue_notice() and returns a job id at once
+#    2. Worker threads/processes claim due jobs and send them
+#    3. Each provider (Resend / Twilio) has a shared token bucket so
+#       all workers together stay under its rate limit
+#    4. Failed channels retry with exponential backoff; after
+#       MAX_ATTEMPTS the job is dead-lettered (status "dead")
+#
+#  Run extra workers in separate processes with:
+#    python notice_queue.py
+# ============================================================
+
+import os
+import json
+import time
+import uuid
+import random
+import sqlite3
+import threading
+from datetime import datetime
+
+# ─────────────────────────────────────────────
+#  CONFIG
+# ─────────────────────────────────────────────
+
+QUEUE_DB       = os.environ.get("NOTICE_QUEUE_DB", os.path.join(os.path.dirname(__file__), "notice_queue.db"))
+MAX_ATTEMPTS   = int(os.environ.get("NOTICE_MAX_ATTEMPTS", "6"))
+BACKOFF_BASE   = 30          # seconds — 30s, 60s, 2m, 4m, 8m ...
+BACKOFF_MAX    = 3600        # never wait more than an hour between tries
+LEASE_SECONDS  = 120         # a claimed job is re-queued if its worker dies (renewed before each send)
+POLL_INTERVAL  = 1.0         # idle worker sleep
+
+# Token buckets: (refill rate per second, burst capacity)
+RATE_LIMITS = {
+    "email":    (float(os.environ.get("RESEND_RATE_PER_SEC", "2")), 2),
+    "whatsapp": (float(os.environ.get("TWILIO_RATE_PER_SEC", "1")), 1),
+}
+
+# Job status values
+JOB_QUEUED  = "queued"    # waiting (new, or backing off before a retry)
+JOB_RUNNING = "running"   # claimed by a worker
+JOB_DONE    = "done"      # every channel finished (sent or permanently failed)
+JOB_DEAD    = "dead"      # gave up after MAX_ATTEMPTS — dead letter
+
+
+# ─────────────────────────────────────────────
+#  STORAGE
+# ─────────────────────────────────────────────
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(QUEUE_DB, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+def init_queue():
+    """Create the queue tables if they don't exist."""
+    conn = _connect()
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id           TEXT PRIMARY KEY,
+            user_id      INTEGER NOT NULL,
+            invoice_id   TEXT NOT NULL,
+            template_no  INTEGER NOT NULL,
+            channels     TEXT NOT NULL,          -- JSON list
+            invoice      TEXT NOT NULL,          -- JSON invoice dict for templates
+            status       TEXT NOT NULL,
+            attempts     INTEGER NOT NULL DEFAULT 0,
+            results      TEXT NOT NULL DEFAULT '{}',  -- JSON {channel: result}
+            last_error   TEXT,
+            next_run_at  REAL NOT NULL,
+            locked_until REAL,
+            created_at   TEXT NOT NULL,
+            updated_at   TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS jobs_due ON jobs (status, next_run_at);
+        CREATE TABLE IF NOT EXISTS rate_limits (
+            provider   TEXT PRIMARY KEY,
+            tokens     REAL NOT NULL,
+            updated_at REAL NOT NULL
+        );
+    """)
+    conn.close()
+
+
+def _job_dict(row) -> dict:
+    return {
+        "job_id":      row["id"],
+        "invoice_id":  row["invoice_id"],
+        "template_no": row["template_no"],
+        "channels":    json.loads(row["channels"]),
+        "status":      row["status"],
+        "attempts":    row["attempts"],
+        "results":     json.loads(row["results"]),
+        "last_error":  row["last_error"],
+        "created_at":  row["created_at"],
+        "updated_at":  row["updated_at"],
+    }
+
+
+# ─────────────────────────────────────────────
+#  PRODUCER SIDE (called from Flask)
+# ─────────────────────────────────────────────
+
+def enqueue_notice(user_id, invoice_id, invoice: dict, template_no: int, channels: list) -> str:
+    """Queue a notice for background dispatch. Returns the job id."""
+    job_id = uuid.uuid4().hex[:12].upper()
+    now = datetime.now().isoformat()
+    conn = _connect()
+    conn.execute(
+        "INSERT INTO jobs (id, user_id, invoice_id, template_no, channels, invoice,"
+        " status, next_run_at, created_at, updated_at)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (job_id, user_id, invoice_id, template_no, json.dumps(channels),
+         json.dumps(invoice, default=str), JOB_QUEUED, time.time(), now, now),
+    )
+    conn.close()
+    return job_id
+
+
+def get_job(job_id, user_id) -> dict:
+    """Get one job's status (must belong to the user). None if not found."""
+    conn = _connect()
+    row = conn.execute(
+        "SELECT * FROM jobs WHERE id = ? AND user_id = ?", (job_id, user_id)
+    ).fetchone()
+    conn.close()
+    return _job_dict(row) if row else None
+
+
+def get_dead_jobs(limit=100) -> list:
+    """List dead-lettered jobs, newest first (for manual inspection/replay)."""
+    conn = _connect()
+    rows = conn.execute(
+        "SELECT * FROM jobs WHERE status = ? ORDER BY updated_at DESC LIMIT ?",
+        (JOB_DEAD, limit),
+    ).fetchall()
+    conn.close()
+    return [_job_dict(r) for r in rows]
+
+
+# ─────────────────────────────────────────────
+#  RATE LIMITING (token bucket shared by all workers)
+# ─────────────────────────────────────────────
+
+def _take_token(conn, provider) -> float:
+    """
+    Try to take one token for a provider.
+    Returns 0 if taken, otherwise the seconds to wait before trying again.
+    """
+    rate, capacity = RATE_LIMITS[provider]
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT tokens, updated_at FROM rate_limits WHERE provider = ?", (provider,)
+        ).fetchone()
+        tokens = capacity if row is None else min(capacity, row["tokens"] + (now - row["updated_at"]) * rate)
+
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+
+        conn.execute(
+            "INSERT OR REPLACE INTO rate_limits (provider, tokens, updated_at) VALUES (?, ?, ?)",
+            (provider, tokens, now),
+        )
+        conn.execute("COMMIT")
+        return wait
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+def _acquire(conn, provider):
+    """Block until the provider's bucket has a token."""
+    while True:
+        wait = _take_token(conn, provider)
+        if wait <= 0:
+            return
+        time.sleep(wait)
+
+
+# ─────────────────────────────────────────────
+#  WORKER SIDE
+# ─────────────────────────────────────────────
+
+def _claim(conn):
+    """
+    Atomically claim the next due job (or one whose worker died).
+    Returns (job, lease) — lease is the locked_until value we wrote, which
+    identifies our claim — or (None, None).
+    """
+    now = time.time()
+    lease = now + LEASE_SECONDS
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT * FROM jobs WHERE (status = ? AND next_run_at <= ?)"
+            " OR (status = ? AND locked_until < ?)"
+            " ORDER BY next_run_at LIMIT 1",
+            (JOB_QUEUED, now, JOB_RUNNING, now),
+        ).fetchone()
+        if row:
+            conn.execute(
+                "UPDATE jobs SET status = ?, locked_until = ?, updated_at = ? WHERE id = ?",
+                (JOB_RUNNING, lease, datetime.now().isoformat(), row["id"]),
+            )
+        conn.execute("COMMIT")
+        return (row, lease) if row else (None, None)
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _renew(conn, job_id, lease, results: dict):
+    """
+    Extend our lease and save per-channel results so far. Returns the new
+    lease, or None if the lease expired and another worker took the job.
+    """
+    new_lease = time.time() + LEASE_SECONDS
+    cur = conn.execute(
+        "UPDATE jobs SET locked_until = ?, results = ?, updated_at = ?"
+        " WHERE id = ? AND status = ? AND locked_until = ?",
+        (new_lease, json.dumps(results), datetime.now().isoformat(), job_id, JOB_RUNNING, lease),
+    )
+    return new_lease if cur.rowcount else None
+
+
+def _backoff(attempts: int) -> float:
+    """Exponential backoff with jitter, capped at BACKOFF_MAX."""
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** (attempts - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _log(job, channel, result, status):
+    from database import log_notice
+    invoice = json.loads(job["invoice"])
+    try:
+        log_notice(
+            invoice_id=job["invoice_id"],
+            user_id=job["user_id"],
+            notice_type=channel,
+            template_no=job["template_no"],
+            sent_to=invoice.get("buyer_contact", "unknown"),
+            status=status,
+            error_msg=None if result.get("success") else result.get("error"),
+        )
+    except Exception as e:
+        print(f"⚠️  Notice log failed for job {job['id']}: {e}")
+
+
+def process_job(conn, job, lease):
+    """
+    Send every channel that hasn't succeeded yet, then either finish
+    the job, schedule a retry, or dead-letter it.
+    Waiting on the rate limiter can outlast the lease, so the lease is
+    renewed right before each send; if another worker has reclaimed the
+    job meanwhile we stop without sending.
+    """
+    from notifier import send_channel
+
+    invoice  = json.loads(job["invoice"])
+    results  = json.loads(job["results"])
+    attempts = job["attempts"] + 1
+    errors   = []
+
+    for channel in json.loads(job["channels"]):
+        prev = results.get(channel)
+        if prev and (prev.get("success") or prev.get("retryable") is False):
+            continue   # already sent, or can never succeed
+
+        _acquire(conn, channel)
+        lease = _renew(conn, job["id"], lease, results)
+        if lease is None:
+            print(f"⚠️  Lease on notice job {job['id']} lost — leaving it to the new owner")
+            return
+        result = send_channel(channel, invoice, job["template_no"])
+        results[channel] = result
+        lease = _renew(conn, job["id"], lease, results) or lease
+
+        if result.get("success"):
+            _log(job, channel, result, "sent")
+        elif result.get("retryable") is False:
+            _log(job, channel, result, "failed")
+        else:
+            errors.append(f"{channel}: {result.get('error')}")
+
+    now = datetime.now().isoformat()
+    if not errors:
+        status, next_run_at = JOB_DONE, time.time()
+    elif attempts >= MAX_ATTEMPTS:
+        status, next_run_at = JOB_DEAD, time.time()
+        for channel, result in results.items():
+            if not result.get("success") and result.get("retryable") is not False:
+                _log(job, channel, result, "failed")
+        print(f"☠️  Notice job {job['id']} dead-lettered after {attempts} attempts")
+    else:
+        status, next_run_at = JOB_QUEUED, time.time() + _backoff(attempts)
+
+    conn.execute(
+        "UPDATE jobs SET status = ?, attempts = ?, results = ?, last_error = ?,"
+        " next_run_at = ?, locked_until = NULL, updated_at = ? WHERE id = ? AND locked_until = ?",
+        (status, attempts, json.dumps(results), "; ".join(errors) or None,
+         next_run_at, now, job["id"], lease),
+    )
+
+
+def work_forever(stop_event: threading.Event = None):
+    """Worker loop — claim and process jobs until stop_event is set."""
+    conn = _connect()
+    while not (stop_event and stop_event.is_set()):
+        try:
+            job, lease = _claim(conn)
+            if job is None:
+                time.sleep(POLL_INTERVAL)
+                continue
+            process_job(conn, job, lease)
+        except Exception as e:
+            print(f"❌ Notice worker error: {e}")
+            time.sleep(POLL_INTERVAL)
+
+
+_workers = []
+
+def start_workers(count: int):
+    """Start `count` worker threads in this process (once)."""
+    if _workers or count <= 0:
+        return
+    init_queue()
+    for i in range(count):
+        t = threading.Thread(target=work_forever, name=f"notice-worker-{i}", daemon=True)
+        t.start()
+        _workers.append(t)
+    print(f"✅ Notice queue: {count} worker thread(s) started")
+
+
+if __name__ == "__main__":
+    print("=" * 55)
+    print("  Digital-Vakeel — Notice Queue Worker")
+    print(f"  Queue: {QUEUE_DB}")
+    print("=" * 55)
+    init_queue()
+    work_forever()
@@ -6,7 +6,10 @@
 
 import os
 import json
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env'))
 from dotenv import load_dotenv
@@ -25,6 +28,51 @@ RESEND_API_KEY  = os.environ.get("RESEND_API_KEY")
 FROM_EMAIL      = os.environ.get("FROM_EMAIL",     "onboarding@resend.dev")
 FROM_NAME       = os.environ.get("FROM_NAME",      "Digital-Vakeel Legal")
 
+RESEND_URL      = "https://api.resend.com/emails"
+NOTIFY_WORKERS  = int(os.environ.get("NOTIFY_WORKERS", "8"))   # max parallel sends
+CHANNELS        = ("email", "whatsapp")
+
+
+# ─────────────────────────────────────────────
+#  SHARED CONNECTIONS (created once, reused)
+#  Keep-alive sessions avoid a TCP + TLS handshake per notice.
+# ─────────────────────────────────────────────
+
+_lock          = threading.Lock()
+_resend        = None
+_twilio        = None
+_executor      = None
+
+def _resend_session() -> requests.Session:
+    """Pooled keep-alive session for the Resend API."""
+    global _resend
+    with _lock:
+        if _resend is None:
+            _resend = requests.Session()
+            _resend.mount("https://", HTTPAdapter(pool_maxsize=NOTIFY_WORKERS))
+            _resend.headers.update({
+                "Authorization": f"Bearer {RESEND_API_KEY}",
+                "Content-Type": "application/json",
+            })
+        return _resend
+
+def _twilio_client():
+    """One Twilio client per process (it pools its own HTTP connections)."""
+    global _twilio
+    with _lock:
+        if _twilio is None:
+            from twilio.rest import Client
+            _twilio = Client(TWILIO_SID, TWILIO_TOKEN)
+        return _twilio
+
+def _pool() -> ThreadPoolExecutor:
+    """Bounded thread pool shared by all dispatches."""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=NOTIFY_WORKERS, thread_name_prefix="notify")
+        return _executor
+
 
 # ─────────────────────────────────────────────
 #  WHATSAPP NOTICE TEMPLATES
@@ -236,8 +284,7 @@ def send_whatsapp(to_phone: str, invoice: dict, template_no: int) -> dict:
     to_phone: e.g. "+919876543210"
     """
     try:
-        from twilio.rest import Client
-        client = Client(TWILIO_SID, TWILIO_TOKEN)
+        client = _twilio_client()
 
         # Ensure proper format
         to_wa = f"whatsapp:{to_phone}" if not to_phone.startswith("whatsapp:") else to_phone
@@ -267,12 +314,8 @@ def send_email(to_email: str, invoice: dict, template_no: int) -> dict:
     try:
         subject, html = _email_template(invoice, template_no)
 
-        response = requests.post(
-            "https://api.resend.com/emails",
-            headers={
-                "Authorization": f"Bearer {RESEND_API_KEY}",
-                "Content-Type": "application/json",
-            },
+        response = _resend_session().post(
+            RESEND_URL,
             json={
                 "from": f"{FROM_NAME} <{FROM_EMAIL}>",
                 "to": [to_email],
@@ -296,33 +339,83 @@ def send_email(to_email: str, invoice: dict, template_no: int) -> dict:
 
 
 # ─────────────────────────────────────────────
-#  DISPATCH NOTICE (combined — tries both)
+#  DISPATCH NOTICE (combined — channels sent in parallel)
 # ─────────────────────────────────────────────
 
+def send_channel(channel: str, invoice: dict, template_no: int) -> dict:
+    """
+    Validate the contact for one channel and send on it.
+    Contact errors are marked retryable=False — retrying can't fix them.
+    """
+    buyer_contact = invoice.get("buyer_contact", "")
+
+    if channel == "email":
+        if "@" in buyer_contact:
+            return send_email(buyer_contact, invoice, template_no)
+        return {"success": False, "retryable": False, "error": "No valid buyer email on file"}
+
+    # whatsapp — buyer_contact may be a phone if it starts with + or digits
+    if buyer_contact.startswith("+") or buyer_contact.lstrip().isdigit():
+        return send_whatsapp(buyer_contact, invoice, template_no)
+    return {"success": False, "retryable": False,
+            "error": "No valid phone number on file (buyer_contact is an email)"}
+
+
+def _submit(invoice: dict, template_no: int, channels: list) -> dict:
+    """Queue one invoice's channels on the pool. Returns {channel: future}."""
+    pool = _pool()
+    return {
+        channel: pool.submit(send_channel, channel, invoice, template_no)
+        for channel in channels if channel in CHANNELS
+    }
+
+
 def dispatch_notice(invoice: dict, template_no: int, channels: list = None) -> dict:
     """
-    Send notice on all requested channels.
+    Send notice on all requested channels (concurrently).
     channels: list of 'email' | 'whatsapp' (default: ['email'])
     Returns dict of results per channel.
     """
     if channels is None:
         channels = ["email"]
 
-    results = {}
-    buyer_contact = invoice.get("buyer_contact", "")
-
-    for channel in channels:
-        if channel == "email":
-            if "@" in buyer_contact:
-                results["email"] = send_email(buyer_contact, invoice, template_no)
-            else:
-                results["email"] = {"success": False, "error": "No valid buyer email on file"}
+    futures = _submit(invoice, template_no, channels)
+    return {channel: f.result() for channel, f in futures.items()}
 
-        elif channel == "whatsapp":
-            # buyer_contact may be a phone if it starts with + or digits
-            if buyer_contact.startswith("+") or buyer_contact.lstrip().isdigit():
-                results["whatsapp"] = send_whatsapp(buyer_contact, invoice, template_no)
-            else:
-                results["whatsapp"] = {"success": False, "error": "No valid phone number on file (buyer_contact is an email)"}
 
+def dispatch_many(jobs: list) -> list:
+    """
+    Send notices for many invoices at once over the shared pool.
+    jobs: list of (invoice, template_no, channels) tuples
+    Returns a list of per-channel result dicts, in the same order as jobs.
+    """
+    results = [None] * len(jobs)
+    for i, result in dispatch_as_completed(jobs):
+        results[i] = result
     return results
+
+
+def dispatch_as_completed(jobs: list):
+    """
+    Send notices for many invoices at once over the shared pool.
+    jobs: list of (invoice, template_no, channels) tuples
+    Yields (job_index, per-channel result dict) as each job finishes, so
+    callers can record every send the moment it happens.
+    """
+    pending = [
+        _submit(invoice, template_no, channels if channels is not None else ["email"])
+        for invoice, template_no, channels in jobs
+    ]
+    owner = {}
+    for i, futures in enumerate(pending):
+        if not futures:
+            yield i, {}
+        for f in futures.values():
+            owner[f] = i
+
+    remaining = [len(futures) for futures in pending]
+    for f in as_completed(owner):
+        i = owner[f]
+        remaining[i] -= 1
+        if remaining[i] == 0:
+            yield i, {channel: f.result() for channel, f in pending[i].items()}
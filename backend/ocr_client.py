@@ -0,0 +1,175 @@
+# ============================================================
+#  ocr_client.py  —  Digital-Vakeel OCR Service Client
+#  Talks to the FastAPI OCR microservice (form-extractor-main).
+#
+#  • One pooled keep-alive Session (no TCP handshake per upload)
+#  • Connect/read timeouts — a hung OCR worker can't pin a Flask thread
+#  • Connection failures are retried; the upload itself is streamed
+#    as the raw request body (POST /extract/raw), never buffered
+#  • Circuit breaker: after OCR_BREAKER_FAILURES consecutive failures
+#    calls fail fast for OCR_BREAKER_COOLDOWN seconds, then one trial
+#    request decides whether to close the circuit again
+#  • Async mode for large PDFs: submit_job() + get_job()
+# ============================================================
+
+import os
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# ─────────────────────────────────────────────
+#  CONFIG
+# ─────────────────────────────────────────────
+
+# OCR_SERVICE_URL historically pointed at the /extract endpoint itself
+OCR_SERVICE_URL  = os.environ.get("OCR_SERVICE_URL", "http://localhost:8000/extract")
+OCR_BASE_URL     = OCR_SERVICE_URL.rstrip("/").rsplit("/extract", 1)[0]
+
+CONNECT_TIMEOUT  = float(os.environ.get("OCR_CONNECT_TIMEOUT", "3"))
+READ_TIMEOUT     = float(os.environ.get("OCR_READ_TIMEOUT", "60"))
+POOL_SIZE        = int(os.environ.get("OCR_POOL_SIZE", "10"))
+BREAKER_FAILURES = int(os.environ.get("OCR_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.environ.get("OCR_BREAKER_COOLDOWN", "30"))
+
+
+class OCRError(Exception):
+    """OCR call failed. `status` is the HTTP status to return to our client."""
+
+    def __init__(self, message, status=502, retry_after=None):
+        super().__init__(message)
+        self.status      = status
+        self.retry_after = retry_after
+
+
+# ─────────────────────────────────────────────
+#  CIRCUIT BREAKER
+# ─────────────────────────────────────────────
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed → open → half-open (one trial) → closed."""
+
+    def __init__(self, max_failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.max_failures = max_failures
+        self.cooldown     = cooldown
+        self._lock        = threading.Lock()
+        self._failures    = 0
+        self._opened_at   = None
+        self._trial       = False
+
+    def before_call(self):
+        """Raise OCRError(503) if the circuit is open."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self.cooldown - (time.time() - self._opened_at)
+            if remaining > 0 or self._trial:
+                raise OCRError("OCR service unavailable (circuit open)", status=503,
+                               retry_after=max(1, int(remaining)))
+            self._trial = True   # half-open: let exactly this call through
+
+    def record_success(self):
+        with self._lock:
+            self._failures  = 0
+            self._opened_at = None
+            self._trial     = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial     = False
+            if self._failures >= self.max_failures:
+                if self._opened_at is None:
+                    print(f"⚠️  OCR circuit opened after {self._failures} failures")
+                self._opened_at = time.time()
+
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half-open" if time.time() - self._opened_at >= self.cooldown else "open"
+
+
+breaker = CircuitBreaker()
+
+
+# ─────────────────────────────────────────────
+#  SESSION
+# ─────────────────────────────────────────────
+
+_lock    = threading.Lock()
+_session = None
+
+def _http() -> requests.Session:
+    """Pooled keep-alive session. Only connection failures are retried —
+    a streamed body can't be replayed once it has been sent."""
+    global _session
+    with _lock:
+        if _session is None:
+            _session = requests.Session()
+            retry = Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.2, allowed_methods=None)
+            adapter = HTTPAdapter(pool_maxsize=POOL_SIZE, max_retries=retry)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def _call(method, path, **kwargs) -> dict:
+    """One request through the breaker. Returns the JSON body or raises OCRError."""
+    breaker.before_call()
+    try:
+        resp = _http().request(method, OCR_BASE_URL + path,
+                               timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), **kwargs)
+    except requests.Timeout:
+        breaker.record_failure()
+        raise OCRError("OCR service timed out", status=504)
+    except requests.RequestException as e:
+        breaker.record_failure()
+        raise OCRError(f"OCR service unreachable: {e}", status=503)
+
+    if resp.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()   # the service answered; 4xx/429 aren't outages
+
+    try:
+        data = resp.json()
+    except ValueError:
+        data = {}
+    if resp.status_code == 429:
+        raise OCRError(data.get("message", "OCR service busy"), status=429,
+                       retry_after=resp.headers.get("Retry-After"))
+    if not resp.ok:
+        raise OCRError(data.get("message", f"OCR service error {resp.status_code}"),
+                       status=502 if resp.status_code >= 500 else resp.status_code)
+    return data
+
+
+# ─────────────────────────────────────────────
+#  PUBLIC API
+# ─────────────────────────────────────────────
+
+def extract(stream, filename: str, template: str = None) -> dict:
+    """Extract the first page of a PDF (file-like, streamed). Returns the fields dict."""
+    params = {"filename": filename}
+    if template:
+        params["template"] = template
+    data = _call("POST", "/extract/raw", data=stream, params=params,
+                 headers={"Content-Type": "application/pdf"})
+    return data.get("fields", {})
+
+
+def submit_job(stream, filename: str, template: str = None) -> str:
+    """Queue a (large) PDF for extraction of every page. Returns the OCR job id."""
+    params = {"filename": filename}
+    if template:
+        params["template"] = template
+    data = _call("POST", "/jobs", data=stream, params=params,
+                 headers={"Content-Type": "application/pdf"})
+    return data["job_id"]
+
+
+def get_job(job_id: str) -> dict:
+    """Job status: {"status": queued|running|done|error, "documents": [...] | "message"}."""
+    return _call("GET", f"/jobs/{job_id}")
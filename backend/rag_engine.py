@@ -3,7 +3,8 @@
 #  Uses FAISS + Groq LLM + HuggingFace Embeddings
 #
 #  LLM:        Groq (via OpenAI-compatible API)
-#  Embeddings: HuggingFace all-MiniLM-L6-v2 (100% local, free)
+#  Embeddings: all-MiniLM-L6-v2 (100% local, free) — HuggingFace
+#              or ONNX int8, see embeddings.py
 #  Vector DB:  FAISS (local)
 #
 #  NO Gemini dependency!
@@ -11,9 +12,10 @@
 
 import os
 import time
-from openai import OpenAI
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
+import threading
+
+# NOTE: openai / faiss / torch are imported inside RAGEngine.__init__
+# so that importing this module (e.g. for SUGGESTED_QUESTIONS) stays cheap.
 
 # ─────────────────────────────────────────────────────────────
 #  CONFIGURATION
@@ -21,14 +23,14 @@ from langchain_community.vectorstores import FAISS
 
 VECTORSTORE_DIR = os.path.join(os.path.dirname(__file__), "vectorstore")
 
+# How often (seconds) to check vectorstore/ for a new build; 0 = never
+WATCH_INTERVAL = float(os.environ.get("VECTORSTORE_WATCH_INTERVAL", "10"))
+
 # Groq API — for LLM answer generation
 GROQ_API_KEY = os.environ.get("GROQ_API_KEY", "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")
 GROQ_BASE_URL = "https://api.groq.com/openai/v1"
 GROQ_MODEL = "llama-3.3-70b-versatile"  # powerful and free on Groq
 
-# HuggingFace Embeddings — runs locally, no API key needed
-EMBEDDING_MODEL = "all-MiniLM-L6-v2"  # small, fast, accurate
-
 # System prompt that shapes the chatbot's personality
 SYSTEM_PROMPT = """You are Digital-Vakeel AI, a specialized legal assistant for Indian MSMEs (Micro, Small and Medium Enterprises) dealing with delayed payment issues.
 
@@ -53,6 +55,48 @@ RULES:
 10. When you are not sure, say so — don't make up legal information"""
 
 
+# ─────────────────────────────────────────────────────────────
+#  READ-WRITE LOCK
+# ─────────────────────────────────────────────────────────────
+
+class ReadWriteLock:
+    """
+    Many concurrent readers (searches) or one writer (index swap).
+    A waiting writer blocks new readers so a swap can't starve.
+    """
+
+    def __init__(self):
+        self._cond    = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._waiting = 0
+
+    def acquire_read(self):
+        with self._cond:
+            while self._writing or self._waiting:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._cond:
+            self._readers -= 1
+            if self._readers == 0:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        with self._cond:
+            self._waiting += 1
+            while self._writing or self._readers:
+                self._cond.wait()
+            self._waiting -= 1
+            self._writing = True
+
+    def release_write(self):
+        with self._cond:
+            self._writing = False
+            self._cond.notify_all()
+
+
 # ─────────────────────────────────────────────────────────────
 #  RAG ENGINE CLASS
 # ─────────────────────────────────────────────────────────────
@@ -68,9 +112,17 @@ class RAGEngine:
     4. Groq LLM generates an answer using context + question (API)
     """
 
-    def __init__(self):
+    def __init__(self, progress=None):
+        """
+        progress: optional callback(stage: str, fraction: float) — lets the
+        server report warm-up progress while this runs in the background.
+        """
+        progress = progress or (lambda stage, fraction: None)
         print("🔧 Initializing RAG engine...")
 
+        progress("loading LLM client", 0.0)
+        from openai import OpenAI
+
         # ── Groq LLM Client ──
         if not GROQ_API_KEY:
             raise ValueError(
@@ -84,31 +136,103 @@ class RAGEngine:
         )
         print(f"   ✅ Groq LLM loaded ({GROQ_MODEL})")
 
-        # ── HuggingFace Embeddings (100% local, no API) ──
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=EMBEDDING_MODEL,
-            model_kwargs={"device": "cpu"},
-            encode_kwargs={"normalize_embeddings": True},
-        )
-        print(f"   ✅ HuggingFace embeddings loaded ({EMBEDDING_MODEL})")
+        # ── Embeddings (100% local, no API) ──
+        progress("loading embedding model", 0.1)
+        from embeddings import EMBEDDING_BACKEND, get_embeddings, embedding_signature
+        self.embeddings = get_embeddings()
+        print(f"   ✅ Embeddings loaded ({embedding_signature()}, {EMBEDDING_BACKEND})")
 
-        # ── FAISS Vector Store ──
+        # Repeat questions skip the forward pass entirely
+        from embedding_cache import EmbeddingCache
+        self.embedding_cache = EmbeddingCache(embedding_signature())
+
+        # ── FAISS Vector Store (memory-mapped, no pickle) ──
+        progress("loading vector store", 0.8)
+        from chunk_store import VectorStore, has_store
         self.vectorstore = None
-        if os.path.exists(VECTORSTORE_DIR):
+        if has_store(VECTORSTORE_DIR):
             try:
-                self.vectorstore = FAISS.load_local(
-                    VECTORSTORE_DIR,
-                    self.embeddings,
-                    allow_dangerous_deserialization=True,
-                )
-                print(f"   ✅ Vector store loaded ({VECTORSTORE_DIR})")
+                self.vectorstore = VectorStore(VECTORSTORE_DIR, self.embeddings)
+                print(f"   ✅ Vector store loaded ({VECTORSTORE_DIR}, {self.vectorstore.index.ntotal} chunks)")
             except Exception as e:
                 print(f"   ❌ Failed to load vector store: {e}")
                 print("      You may need to rebuild: python build_vectorstore.py")
+        elif os.path.exists(os.path.join(VECTORSTORE_DIR, "index.pkl")):
+            print(f"   ⚠️  Old pickle-based vector store at {VECTORSTORE_DIR}")
+            print("      Run: python chunk_store.py convert   (or python build_vectorstore.py)")
         else:
             print(f"   ⚠️  Vector store not found at {VECTORSTORE_DIR}")
             print("      Run: python build_vectorstore.py")
 
+        # ── Answer cache (tied to this exact vector store build) ──
+        from answer_cache import AnswerCache, vectorstore_fingerprint
+        self.fingerprint = vectorstore_fingerprint(VECTORSTORE_DIR)
+        self.answer_cache = AnswerCache(self.fingerprint)
+
+        # Searches hold the read side; reload_vectorstore() the write side
+        self._index_lock   = ReadWriteLock()
+        self._reload_mutex = threading.Lock()
+        self._watcher      = None
+        progress("ready", 1.0)
+
+    # ── Hot swap ──
+
+    def reload_vectorstore(self) -> dict:
+        """
+        Load the current vectorstore/ build and swap it in. The new index is
+        opened before taking the write lock, so searches only pause for the
+        pointer swap; searches already running finish on the old index.
+        """
+        from answer_cache import vectorstore_fingerprint
+        from chunk_store import VectorStore, has_store
+
+        with self._reload_mutex:
+            fingerprint = vectorstore_fingerprint(VECTORSTORE_DIR)
+            if not has_store(VECTORSTORE_DIR):
+                return {"reloaded": False, "error": "No complete vector store on disk"}
+            try:
+                new_store = VectorStore(VECTORSTORE_DIR, self.embeddings)
+            except Exception as e:
+                print(f"   ❌ Vector store reload failed, keeping current index: {e}")
+                return {"reloaded": False, "error": str(e)}
+
+            self._index_lock.acquire_write()
+            try:
+                old_store, self.vectorstore = self.vectorstore, new_store
+                self.fingerprint = fingerprint
+            finally:
+                self._index_lock.release_write()
+            if old_store is not None:
+                old_store.close()
+
+            # Old answers may cite chunks that changed or no longer exist
+            self.answer_cache.invalidate(fingerprint)
+            print(f"   🔄 Vector store reloaded ({new_store.index.ntotal} chunks)")
+            return {"reloaded": True, "chunks": new_store.index.ntotal}
+
+    def _watch(self, on_reload):
+        from answer_cache import vectorstore_fingerprint
+        from chunk_store import has_store
+        while True:
+            time.sleep(WATCH_INTERVAL)
+            try:
+                fingerprint = vectorstore_fingerprint(VECTORSTORE_DIR)
+                if fingerprint != self.fingerprint and has_store(VECTORSTORE_DIR):
+                    result = self.reload_vectorstore()
+                    if result["reloaded"] and on_reload:
+                        on_reload(result)
+            except Exception as e:
+                print(f"   ⚠️  Vector store watcher error: {e}")
+
+    def start_watcher(self, on_reload=None):
+        """Poll vectorstore/ every WATCH_INTERVAL seconds and hot-swap new builds."""
+        if self._watcher is None and WATCH_INTERVAL > 0:
+            self._watcher = threading.Thread(
+                target=self._watch, args=(on_reload,), name="vectorstore-watcher", daemon=True
+            )
+            self._watcher.start()
+        return self._watcher
+
     def _call_groq(self, system_prompt, user_prompt, max_retries=2):
         """Call Groq API with retry logic."""
         for attempt in range(max_retries + 1):
@@ -135,32 +259,75 @@ class RAGEngine:
         """Check if engine is fully ready."""
         return self.vectorstore is not None
 
-    def ask(self, question: str) -> dict:
-        """Ask a legal question. Returns answer + sources."""
-        if not self.vectorstore:
-            return {
-                "answer": "Knowledge base not loaded. Run build_vectorstore.py first.",
-                "sources": [],
-                "success": False,
-            }
+    def cache_stats(self) -> dict:
+        """Hit rates of the embedding and answer caches."""
+        return {
+            "embeddings": self.embedding_cache.stats(),
+            "answers":    self.answer_cache.stats(),
+        }
+
+    def _call_groq_stream(self, system_prompt, user_prompt, max_retries=2):
+        """Stream Groq tokens as they arrive. Retries only before the first token."""
+        for attempt in range(max_retries + 1):
+            try:
+                stream = self.groq_client.chat.completions.create(
+                    model=GROQ_MODEL,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt},
+                    ],
+                    temperature=0.3,
+                    max_tokens=1024,
+                    stream=True,
+                )
+                break
+            except Exception as e:
+                if ("429" in str(e) or "rate" in str(e).lower()) and attempt < max_retries:
+                    wait = 10 * (attempt + 1)
+                    print(f"   ⏳ Rate limited. Waiting {wait}s... (attempt {attempt+1}/{max_retries})")
+                    time.sleep(wait)
+                else:
+                    raise
 
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def _retrieve(self, question):
+        """
+        Embed the question, check the answer cache, and fetch context.
+        Returns (embedding, cached_result_or_None, sources, user_prompt,
+        fingerprint of the store that was searched).
+        """
+        # Step 0: Embed once (or reuse a cached vector) — used for the
+        # answer cache lookup and FAISS
+        embedding = self.embedding_cache.embed(question, self.embeddings.embed_query)
+        cached = self.answer_cache.get(question, embedding)
+        if cached:
+            return embedding, cached, cached["sources"], None, None
+
+        # Step 1: Search FAISS for relevant chunks (the index can't be
+        # swapped out mid-search)
+        self._index_lock.acquire_read()
         try:
-            # Step 1: Search FAISS for relevant chunks
-            docs = self.vectorstore.similarity_search(question, k=4)
+            docs = self.vectorstore.similarity_search_by_vector(embedding, k=4)
+            fingerprint = self.fingerprint
+        finally:
+            self._index_lock.release_read()
 
-            # Step 2: Build context from retrieved chunks
-            context_parts = []
-            sources = []
-            for doc in docs:
-                context_parts.append(doc.page_content)
-                source_name = os.path.basename(doc.metadata.get("source", "unknown"))
-                snippet = doc.page_content[:200] + "..." if len(doc.page_content) > 200 else doc.page_content
-                sources.append({"document": source_name, "snippet": snippet})
+        # Step 2: Build context from retrieved chunks
+        context_parts = []
+        sources = []
+        for doc in docs:
+            context_parts.append(doc.page_content)
+            source_name = os.path.basename(doc.metadata.get("source", "unknown"))
+            snippet = doc.page_content[:200] + "..." if len(doc.page_content) > 200 else doc.page_content
+            sources.append({"document": source_name, "snippet": snippet})
 
-            context = "\n\n---\n\n".join(context_parts)
+        context = "\n\n---\n\n".join(context_parts)
 
-            # Step 3: Build prompt and call Groq
-            user_prompt = f"""Here is relevant information from the legal knowledge base:
+        # Step 3: Build prompt
+        user_prompt = f"""Here is relevant information from the legal knowledge base:
 
 {context}
 
@@ -170,8 +337,51 @@ User's Question: {question}
 
 Please provide a clear, helpful, and accurate answer based on the information above:"""
 
+        return embedding, None, sources, user_prompt, fingerprint
+
+    @staticmethod
+    def _error_result(e) -> dict:
+        error_msg = str(e)
+        print(f"❌ RAG query error: {error_msg}")
+        if "429" in error_msg or "rate" in error_msg.lower() or "quota" in error_msg.lower():
+            return {
+                "answer": "⏳ The AI service is temporarily rate-limited. Please wait and try again.",
+                "sources": [],
+                "success": False,
+            }
+        return {
+            "answer": "Sorry, I encountered an error. Please try again.",
+            "sources": [],
+            "success": False,
+        }
+
+    def ask(self, question: str, stream: bool = False):
+        """
+        Ask a legal question. Returns answer + sources.
+
+        With stream=True returns a generator of events instead:
+          {"type": "sources", "sources": [...]}       — right after retrieval
+          {"type": "token",   "text": "..."}          — as the LLM produces them
+          {"type": "done",    "answer", "sources", "success"}  — always last
+        """
+        if stream:
+            return self._ask_stream(question)
+
+        if not self.vectorstore:
+            return {
+                "answer": "Knowledge base not loaded. Run build_vectorstore.py first.",
+                "sources": [],
+                "success": False,
+            }
+
+        try:
+            embedding, cached, sources, user_prompt, fingerprint = self._retrieve(question)
+            if cached:
+                return {**cached, "success": True, "cached": True}
+
             # Step 4: Call Groq LLM
             answer = self._call_groq(SYSTEM_PROMPT, user_prompt)
+            self.answer_cache.put(question, embedding, answer, sources, fingerprint)
 
             return {
                 "answer": answer,
@@ -180,19 +390,39 @@ Please provide a clear, helpful, and accurate answer based on the information ab
             }
 
         except Exception as e:
-            error_msg = str(e)
-            print(f"❌ RAG query error: {error_msg}")
-            if "429" in error_msg or "rate" in error_msg.lower() or "quota" in error_msg.lower():
-                return {
-                    "answer": "⏳ The AI service is temporarily rate-limited. Please wait and try again.",
-                    "sources": [],
-                    "success": False,
-                }
-            return {
-                "answer": "Sorry, I encountered an error. Please try again.",
+            return self._error_result(e)
+
+    def _ask_stream(self, question: str):
+        """Generator behind ask(stream=True)."""
+        if not self.vectorstore:
+            yield {
+                "type": "done",
+                "answer": "Knowledge base not loaded. Run build_vectorstore.py first.",
                 "sources": [],
                 "success": False,
             }
+            return
+
+        try:
+            embedding, cached, sources, user_prompt, fingerprint = self._retrieve(question)
+            yield {"type": "sources", "sources": sources}
+
+            if cached:
+                yield {"type": "token", "text": cached["answer"]}
+                yield {"type": "done", **cached, "success": True, "cached": True}
+                return
+
+            parts = []
+            for text in self._call_groq_stream(SYSTEM_PROMPT, user_prompt):
+                parts.append(text)
+                yield {"type": "token", "text": text}
+
+            answer = "".join(parts)
+            self.answer_cache.put(question, embedding, answer, sources, fingerprint)
+            yield {"type": "done", "answer": answer, "sources": sources, "success": True}
+
+        except Exception as e:
+            yield {"type": "done", **self._error_result(e)}
 
 
 # ─────────────────────────────────────────────────────────────
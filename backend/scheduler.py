@@ -0,0 +1,239 @@
+# ============================================================
+#  scheduler.py  —  Digital-Vakeel Daily Trigger Scheduler
+#  Fires the Day 46 / 60 / 67 notices automatically.
+#
+#  A milestone fires on exactly one day per invoice:
+#      invoice_date == run_day - milestone_day
+#  so each run asks the DB only for unpaid invoices dated on those
+#  three days (partial index on invoice_date, see README) instead of
+#  scanning every invoice. Cost = O(invoices firing today).
+#
+#  Notices go out concurrently, and each one is checkpointed to
+#  scheduler_state.json as soon as its send completes, so a
+#  crash/restart can only repeat the few sends that were in flight
+#  (at most NOTIFY_WORKERS), and missed days (server down) are caught
+#  up on the next run.
+#
+#  Usage:
+#    python scheduler.py            # run today's triggers once
+#    ENABLE_SCHEDULER=1 python app.py   # run daily in the background
+# ============================================================
+
+import os
+import json
+import time
+import threading
+from dataclasses import replace
+from datetime import date, datetime, timedelta
+
+from invoice_engine import (
+    Invoice, calculate, check_triggers, normalize_date,
+    PAYMENT_WINDOW_DAYS, TRIGGER_WHATSAPP, TRIGGER_LEGAL_EMAIL, TRIGGER_FINAL_NOTICE,
+)
+
+# ─────────────────────────────────────────────
+#  CONFIG
+# ─────────────────────────────────────────────
+
+STATE_FILE       = os.path.join(os.path.dirname(__file__), "scheduler_state.json")
+RUN_AT           = os.environ.get("SCHEDULER_RUN_AT", "09:00")   # local time, HH:MM
+MAX_CATCHUP_DAYS = 7        # don't replay more than a week of missed runs
+MILESTONE_DAYS   = (TRIGGER_WHATSAPP, TRIGGER_LEGAL_EMAIL, TRIGGER_FINAL_NOTICE)
+
+
+# ─────────────────────────────────────────────
+#  CHECKPOINT FILE
+# ─────────────────────────────────────────────
+
+def _load_state() -> dict:
+    """Load scheduler progress. Empty state on first run."""
+    if not os.path.exists(STATE_FILE):
+        return {"last_completed": None, "day": None, "done": []}
+    with open(STATE_FILE, "r") as f:
+        return json.load(f)
+
+def _save_state(state: dict):
+    """Write progress atomically (temp file + rename) so a crash can't corrupt it."""
+    tmp_path = STATE_FILE + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, STATE_FILE)
+
+
+# ─────────────────────────────────────────────
+#  TRIGGER LOGIC
+# ─────────────────────────────────────────────
+
+def milestone_invoice_dates(run_day: date) -> dict:
+    """Map each invoice_date that hits a milestone on run_day → milestone day."""
+    return {(run_day - timedelta(days=d)).isoformat(): d for d in MILESTONE_DAYS}
+
+
+def stored_date_forms(iso_date: str) -> set:
+    """
+    Every way a date may be stored in the TEXT column. Rows saved before
+    dates were normalized can be unpadded ("2026-9-2"); querying all forms
+    keeps the exact-match index lookup without missing them.
+    """
+    d = date.fromisoformat(iso_date)
+    return {f"{d.year}-{m}-{dd}"
+            for m in (f"{d.month:02d}", str(d.month))
+            for dd in (f"{d.day:02d}", str(d.day))}
+
+
+def _to_invoice(row: dict) -> Invoice:
+    """Build a calculated Invoice from a DB row (live values as of today)."""
+    inv = Invoice(
+        seller_name=row["seller_name"],  buyer_name=row["buyer_name"],
+        invoice_no=row["invoice_no"],    invoice_date=row["invoice_date"],
+        amount=float(row["amount"]),
+        udyam_id=row.get("udyam_id") or "", buyer_contact=row.get("buyer_contact") or "",
+        buyer_gstin=row.get("buyer_gstin") or "",
+    )
+    inv.id = row["id"]
+    return calculate(inv)
+
+
+def triggers_for_day(rows: list, run_day: date) -> list:
+    """
+    Work out which notices fire on run_day for the fetched rows.
+    Returns a list of (row, invoice_dict, trigger) tuples.
+    """
+    by_date = milestone_invoice_dates(run_day)
+    jobs = []
+    for row in rows:
+        try:
+            milestone = by_date.get(normalize_date(row["invoice_date"]))
+        except ValueError:
+            print(f"⚠️  Invoice {row.get('id')} has an unreadable invoice_date "
+                  f"{row['invoice_date']!r} — no notices for it")
+            continue
+        if milestone is None:
+            continue
+        inv = _to_invoice(row)
+        # check_triggers() looks at days_overdue — pin it to run_day so
+        # catch-up runs for missed days still pick the right template
+        as_of_run_day = replace(inv, days_overdue=milestone - PAYMENT_WINDOW_DAYS)
+        for trigger in check_triggers(as_of_run_day):
+            jobs.append((row, inv.to_dict(), trigger))
+    return jobs
+
+
+def _job_key(row: dict, trigger: dict) -> str:
+    return f"{row['id']}|{trigger['template_no']}|{trigger['channel']}"
+
+
+def run_for_day(run_day: date, state: dict) -> int:
+    """
+    Fire every notice due on run_day that isn't already in the checkpoint.
+    Returns the number of notices dispatched.
+    """
+    from database import get_unpaid_invoices_by_dates, log_notice
+    from notifier import dispatch_as_completed
+
+    if state.get("day") != run_day.isoformat():
+        state["day"]  = run_day.isoformat()
+        state["done"] = []
+    done = set(state["done"])
+
+    rows = get_unpaid_invoices_by_dates(
+        {form for d in milestone_invoice_dates(run_day) for form in stored_date_forms(d)}
+    )
+    jobs = [
+        (row, invoice_dict, trigger)
+        for row, invoice_dict, trigger in triggers_for_day(rows, run_day)
+        if _job_key(row, trigger) not in done
+    ]
+    sent = 0
+
+    # Send concurrently, but log + checkpoint each notice the moment it
+    # completes — a restart can only repeat sends that were in flight
+    dispatches = dispatch_as_completed([
+        (invoice_dict, trigger["template_no"], [trigger["channel"]])
+        for _, invoice_dict, trigger in jobs
+    ])
+    for i, results in dispatches:
+        row, invoice_dict, trigger = jobs[i]
+        for channel, result in results.items():
+            log_notice(
+                invoice_id=row["id"],
+                user_id=row["user_id"],
+                notice_type=channel,
+                template_no=trigger["template_no"],
+                sent_to=invoice_dict.get("buyer_contact", "unknown"),
+                status="sent" if result.get("success") else "failed",
+                error_msg=None if result.get("success") else result.get("error"),
+            )
+        done.add(_job_key(row, trigger))
+        sent += 1
+        state["done"] = sorted(done)
+        _save_state(state)
+
+    return sent
+
+
+def run_pending(today: date = None) -> int:
+    """
+    Run every day from the last checkpoint up to today (inclusive).
+    Safe to call repeatedly — finished days and sent notices are skipped.
+    """
+    today = today or date.today()
+    state = _load_state()
+
+    if state.get("last_completed"):
+        start = date.fromisoformat(state["last_completed"]) + timedelta(days=1)
+    else:
+        start = today
+    start = max(start, today - timedelta(days=MAX_CATCHUP_DAYS - 1))
+
+    total = 0
+    day = start
+    while day <= today:
+        count = run_for_day(day, state)
+        print(f"⏰ Scheduler {day.isoformat()} | {count} notice(s) dispatched")
+        state["last_completed"] = day.isoformat()
+        _save_state(state)
+        total += count
+        day += timedelta(days=1)
+    return total
+
+
+# ─────────────────────────────────────────────
+#  BACKGROUND THREAD
+# ─────────────────────────────────────────────
+
+def _seconds_until_next_run(now: datetime) -> float:
+    hour, minute = (int(x) for x in RUN_AT.split(":"))
+    next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if next_run <= now:
+        next_run += timedelta(days=1)
+    return (next_run - now).total_seconds()
+
+
+def _loop():
+    while True:
+        try:
+            run_pending()
+        except Exception as e:
+            print(f"❌ Scheduler run failed: {e}")
+        time.sleep(_seconds_until_next_run(datetime.now()))
+
+
+_thread = None
+
+def start_scheduler():
+    """Start the daily trigger loop in a daemon thread (once per process)."""
+    global _thread
+    if _thread is None:
+        _thread = threading.Thread(target=_loop, name="trigger-scheduler", daemon=True)
+        _thread.start()
+        print(f"✅ Trigger scheduler started (daily at {RUN_AT})")
+    return _thread
+
+
+if __name__ == "__main__":
+    print("=" * 55)
+    print("  Digital-Vakeel — Trigger Scheduler (single run)")
+    print("=" * 55)
+    total = run_pending()
+    print(f"\n  Done. {total} notice(s) dispatched.")
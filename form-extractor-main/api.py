@@ -5,15 +5,36 @@ POST an invoice image to /extract and receive structured JSON fields.
 Usage:
     python -m uvicorn api:app --host 0.0.0.0 --port 8000
     curl -F "file=@invoice.png" http://localhost:8000/extract
+    curl -F "files=@a.pdf" -F "files=@b.pdf" http://localhost:8000/extract/batch
+    curl --data-binary @invoice.pdf "http://localhost:8000/extract/raw?filename=invoice.pdf"
+    curl --data-binary @big.pdf http://localhost:8000/jobs   # then GET /jobs/<job_id>
+    curl http://localhost:8000/stats
 """
 import os
+import time
 import uuid
-import shutil
-import tempfile
-from fastapi import FastAPI, UploadFile, File
+import asyncio
+from typing import List, Optional
+from fastapi import FastAPI, Request, UploadFile, File, Query
 from fastapi.responses import JSONResponse
+from starlette.formparsers import MultiPartParser
 
-from step8_predict_pdf import load_ocr_model, extract_fields_from_pdf
+from inference_pool import InferencePool, PoolFull
+from result_cache import ResultCache, cache_key
+from step8_predict_pdf import pipeline_signature
+from template_registry import registry
+
+MAX_BATCH_FILES = int(os.environ.get('MAX_BATCH_FILES', '500'))
+
+# Finished async jobs are forgotten after this many seconds
+JOB_TTL = int(os.environ.get('OCR_JOB_TTL', '3600'))
+# Queued + running async jobs (each holds its PDF in memory); more get a 429
+MAX_PENDING_JOBS = int(os.environ.get('OCR_MAX_PENDING_JOBS', '32'))
+
+# Uploads up to this size stay in memory end to end (no temp files);
+# only larger ones are spooled to disk by the multipart parser.
+SPOOL_THRESHOLD = int(os.environ.get('UPLOAD_SPOOL_THRESHOLD', str(32 * 1024 * 1024)))
+MultiPartParser.spool_max_size = SPOOL_THRESHOLD
 
 app = FastAPI(
     title='MSME Invoice OCR API',
@@ -21,55 +42,269 @@ app = FastAPI(
     version='2.0.0'
 )
 
-# Load models at startup
-ocr_model = None
+# DocTR runs in worker processes (each loads its own model), so the
+# event loop stays free while pages are being recognized
+pool = InferencePool()
+
+# Results of previous uploads, keyed by file hash + template version
+result_cache = ResultCache()
 
 
 @app.on_event("startup")
 async def startup():
-    global ocr_model
-    print("Loading DocTR model...")
-    ocr_model = load_ocr_model()
+    print(f"Templates loaded: {', '.join(registry.names())}")
+    print(f"Starting {pool.workers} OCR worker(s)...")
+    pool.start()
     print("API ready!")
 
 
+@app.on_event("shutdown")
+async def shutdown():
+    pool.shutdown()
+
+
+def _busy(e):
+    return JSONResponse(
+        {'status': 'error', 'message': str(e)},
+        status_code=429,
+        headers={'Retry-After': str(max(1, round(pool.stats()['avg_latency_ms'] / 1000)))}
+    )
+
+
 @app.get('/')
 async def root():
     return {
         'service': 'MSME Invoice OCR API (V2 Template Guided)',
         'status': 'running',
-        'usage': 'POST a PDF invoice to /extract'
+        'usage': 'POST a PDF invoice to /extract, or many to /extract/batch'
+    }
+
+
+@app.get('/stats')
+async def stats():
+    """OCR worker pool load (queue depth, service times) and result cache hit rate."""
+    return {**pool.stats(), 'result_cache': result_cache.stats()}
+
+
+@app.get('/templates')
+async def list_templates():
+    """Layouts the service knows about (reloaded automatically when edited)."""
+    return {
+        'templates': [
+            {'name': t.name, 'version': t.version, 'field_count': len(t.names)}
+            for t in (registry.get(n) for n in registry.names())
+        ]
     }
 
 
+def _check_template(template):
+    """JSONResponse error for an unknown template name, else None."""
+    if template and template != 'auto' and template not in registry.names():
+        return JSONResponse(
+            {'status': 'error', 'message': f"Unknown template '{template}'"},
+            status_code=400
+        )
+    return None
+
+
+async def _extract_cached(pdfs, template, first_page_only=False):
+    """
+    Per-document page results (or an Exception), like extract_fields_from_pdfs(),
+    running only the documents that aren't in the result cache.
+    """
+    # Template content (incl. its _meta.dpi), model and page-input settings
+    version = f'{registry.version(template)}|{pipeline_signature()}'
+    keys = [cache_key(pdf, version, first_page_only) for pdf in pdfs]
+    per_doc = [result_cache.get(key) for key in keys]
+
+    missing = [i for i, pages in enumerate(per_doc) if pages is None]
+    if missing:
+        fresh = await pool.extract([pdfs[i] for i in missing], template, first_page_only)
+        for i, pages in zip(missing, fresh):
+            per_doc[i] = pages
+            if not isinstance(pages, Exception):
+                result_cache.put(keys[i], pages)
+    return per_doc
+
+
+async def _extract_first_page(filename, pdf_bytes, template):
+    """Response for a single-invoice upload (first page only)."""
+    try:
+        pages = (await _extract_cached([pdf_bytes], template, first_page_only=True))[0]
+        if isinstance(pages, Exception):
+            raise pages
+        result = pages[0]
+        return JSONResponse({
+            'status': 'ok',
+            'filename': filename,
+            'template': result['template'],
+            'fields': result['fields'],
+            'field_count': len(result['fields'])
+        })
+    except PoolFull as e:
+        return _busy(e)
+    except Exception as e:
+        return JSONResponse(
+            {'status': 'error', 'message': str(e)},
+            status_code=500
+        )
+
+
+def _documents(filenames, per_doc):
+    """One entry per page (or per failed document) for batch-style responses."""
+    documents = []
+    for filename, pages in zip(filenames, per_doc):
+        if isinstance(pages, Exception):
+            documents.append({'filename': filename, 'status': 'error', 'message': str(pages)})
+            continue
+        for page_no, result in enumerate(pages, start=1):
+            documents.append({
+                'filename': filename,
+                'page': page_no,
+                'status': 'ok',
+                'template': result['template'],
+                'fields': result['fields'],
+                'field_count': len(result['fields'])
+            })
+    return documents
+
+
 @app.post('/extract')
-async def extract_invoice(file: UploadFile = File(...)):
+async def extract_invoice(file: UploadFile = File(...),
+                          template: Optional[str] = Query(None, description="template name, or 'auto'")):
     """
     Upload an invoice PDF and receive extracted fields as JSON.
     """
-    # Save upload to a temp file (Windows-compatible)
-    tmp_dir = tempfile.gettempdir()
-    tmp_path = os.path.join(tmp_dir, f'{uuid.uuid4()}_{file.filename}')
+    bad_template = _check_template(template)
+    if bad_template:
+        return bad_template
+
+    # Render straight from the uploaded bytes — no copy to a temp file
+    return await _extract_first_page(file.filename, await file.read(), template)
 
-    try:
-        with open(tmp_path, 'wb') as f:
-            shutil.copyfileobj(file.file, f)
 
-        result = extract_fields_from_pdf(tmp_path, ocr_model)
+@app.post('/extract/raw')
+async def extract_invoice_raw(request: Request,
+                              filename: str = Query('upload.pdf'),
+                              template: Optional[str] = Query(None, description="template name, or 'auto'")):
+    """
+    Same as /extract, but the request body is the PDF itself (no multipart
+    encoding), so callers can stream the upload instead of buffering it.
+    """
+    bad_template = _check_template(template)
+    if bad_template:
+        return bad_template
+
+    return await _extract_first_page(filename, await request.body(), template)
+
+
+@app.post('/extract/batch')
+async def extract_invoice_batch(files: List[UploadFile] = File(...),
+                                template: Optional[str] = Query(None, description="template name, or 'auto'")):
+    """
+    Upload many invoice PDFs (or one multi-page PDF with one invoice per page)
+    and receive one field map per page. All pages run through DocTR together.
+    """
+    bad_template = _check_template(template)
+    if bad_template:
+        return bad_template
+
+    if len(files) > MAX_BATCH_FILES:
+        return JSONResponse(
+            {'status': 'error', 'message': f'Too many files (max {MAX_BATCH_FILES})'},
+            status_code=413
+        )
+
+    try:
+        pdfs = [await file.read() for file in files]
+        per_doc = await _extract_cached(pdfs, template)
+        documents = _documents([file.filename for file in files], per_doc)
         return JSONResponse({
             'status': 'ok',
-            'filename': file.filename,
-            'fields': result,
-            'field_count': len(result)
+            'documents': documents,
+            'document_count': len(documents)
         })
+    except PoolFull as e:
+        return _busy(e)
     except Exception as e:
         return JSONResponse(
             {'status': 'error', 'message': str(e)},
             status_code=500
         )
+
+
+# ── Async jobs: submit a (large) PDF, poll for the result ────
+
+jobs = {}        # job_id → {'status', 'filename', 'created', 'finished', 'documents' | 'message'}
+job_tasks = set()   # strong refs so pending tasks aren't garbage-collected
+
+
+def _prune_jobs():
+    """Forget finished jobs after JOB_TTL; queued/running ones are never dropped."""
+    cutoff = time.time() - JOB_TTL
+    expired = [j for j, job in jobs.items()
+               if job['status'] in ('done', 'error') and job['finished'] < cutoff]
+    for job_id in expired:
+        del jobs[job_id]
+
+
+def _pending_jobs():
+    return sum(1 for job in jobs.values() if job['status'] in ('queued', 'running'))
+
+
+async def _run_job(job_id, pdf_bytes, template):
+    job = jobs[job_id]
+    job['status'] = 'running'
+    try:
+        while True:
+            try:
+                per_doc = await _extract_cached([pdf_bytes], template)
+                break
+            except PoolFull:
+                # Jobs wait for capacity instead of failing like sync requests
+                await asyncio.sleep(1)
+        if isinstance(per_doc[0], Exception):
+            raise per_doc[0]
+        job['documents'] = _documents([job['filename']], per_doc)
+        job['status'] = 'done'
+    except Exception as e:
+        job['message'] = str(e)
+        job['status'] = 'error'
     finally:
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
+        job['finished'] = time.time()
+
+
+@app.post('/jobs', status_code=202)
+async def submit_job(request: Request,
+                     filename: str = Query('upload.pdf'),
+                     template: Optional[str] = Query(None, description="template name, or 'auto'")):
+    """
+    Queue a PDF (raw request body) for extraction of every page and return
+    a job id at once. Poll GET /jobs/{job_id} for the result.
+    """
+    bad_template = _check_template(template)
+    if bad_template:
+        return bad_template
+
+    _prune_jobs()
+    if _pending_jobs() >= MAX_PENDING_JOBS:
+        return _busy(PoolFull(f'{MAX_PENDING_JOBS} jobs already pending, retry later'))
+
+    pdf_bytes = await request.body()
+    job_id = uuid.uuid4().hex[:12]
+    jobs[job_id] = {'status': 'queued', 'filename': filename, 'created': time.time()}
+    task = asyncio.create_task(_run_job(job_id, pdf_bytes, template))
+    job_tasks.add(task)
+    task.add_done_callback(job_tasks.discard)
+    return {'job_id': job_id, 'status': 'queued'}
+
+
+@app.get('/jobs/{job_id}')
+async def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        return JSONResponse({'status': 'error', 'message': 'Job not found'}, status_code=404)
+    return {'job_id': job_id, **{k: v for k, v in job.items() if k not in ('created', 'finished')}}
 
 
 if __name__ == '__main__':
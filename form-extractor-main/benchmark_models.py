@@ -0,0 +1,112 @@
+"""
+Accuracy vs latency of the OCR model profiles on a folder of sample invoices.
+
+For every profile (with and without int8 quantization) the samples are run
+one invoice at a time and compared field by field against ground truth:
+<name>.json or <name>_extracted.json next to <name>.pdf (the file
+step8_predict_pdf.py writes, hand-corrected).
+Samples without a ground-truth file are scored against the 'accurate'
+fp32 output instead.
+
+Usage:
+    python benchmark_models.py <samples_dir> [profile ...] [--threads N] [--template NAME]
+    python benchmark_models.py samples/ fast balanced --threads 4
+"""
+import os
+import sys
+import json
+import time
+import difflib
+
+from step8_predict_pdf import MODEL_PROFILES, load_ocr_model, model_signature, extract_fields_from_pdfs
+
+REFERENCE = ('accurate', False)
+
+
+def normalize(text):
+    return ' '.join((text or '').split()).lower()
+
+
+def score(predicted: dict, truth: dict) -> tuple:
+    """(exact field match rate, mean character similarity) over the truth's fields."""
+    if not truth:
+        return 0.0, 0.0
+    exact, similarity = 0, 0.0
+    for name, expected in truth.items():
+        got, expected = normalize(predicted.get(name)), normalize(expected)
+        exact += got == expected
+        similarity += difflib.SequenceMatcher(None, got, expected).ratio()
+    return exact / len(truth), similarity / len(truth)
+
+
+def run_profile(pdfs: dict, profile: str, quantize: bool, threads: int, template: str) -> dict:
+    """Fields per sample plus per-invoice latencies for one configuration."""
+    model = load_ocr_model(profile, quantize, threads)
+    first = next(iter(pdfs.values()))
+    # text_layer=False: digital samples must still go through the model
+    extract_fields_from_pdfs([first], model, template, first_page_only=True, text_layer=False)   # warm-up
+
+    outputs, latencies = {}, []
+    for name, pdf in pdfs.items():
+        started = time.perf_counter()
+        result = extract_fields_from_pdfs([pdf], model, template, first_page_only=True, text_layer=False)[0]
+        latencies.append(time.perf_counter() - started)
+        outputs[name] = {} if isinstance(result, Exception) else result[0]['fields']
+    return {'outputs': outputs, 'latencies': sorted(latencies)}
+
+
+def main(argv):
+    threads = 0
+    template = None
+    if '--threads' in argv:
+        i = argv.index('--threads')
+        threads = int(argv[i + 1])
+        del argv[i:i + 2]
+    if '--template' in argv:
+        i = argv.index('--template')
+        template = argv[i + 1]
+        del argv[i:i + 2]
+    if not argv:
+        print(__doc__)
+        exit(1)
+
+    samples_dir, profiles = argv[0], argv[1:] or list(MODEL_PROFILES)
+    pdfs = {}
+    for filename in sorted(os.listdir(samples_dir)):
+        if filename.lower().endswith('.pdf'):
+            with open(os.path.join(samples_dir, filename), 'rb') as f:
+                pdfs[filename[:-4]] = f.read()
+    if not pdfs:
+        print(f"ERROR: no PDFs in {samples_dir}")
+        exit(1)
+
+    truth = {}
+    for name in pdfs:
+        for suffix in ('.json', '_extracted.json'):
+            truth_path = os.path.join(samples_dir, name + suffix)
+            if os.path.exists(truth_path):
+                with open(truth_path) as f:
+                    truth[name] = json.load(f)
+                break
+
+    configs = [REFERENCE] + [(p, q) for p in profiles for q in (False, True) if (p, q) != REFERENCE]
+    runs = {config: run_profile(pdfs, *config, threads, template) for config in configs}
+    reference = runs[REFERENCE]['outputs']
+
+    print("=" * 78)
+    print(f"{len(pdfs)} sample(s), {len(truth)} with ground truth, threads={threads or 'default'}")
+    print("=" * 78)
+    print(f"{'profile':<22}{'exact':>9}{'similar':>10}{'mean ms':>11}{'p95 ms':>10}{'inv/s':>9}")
+    for config, run in runs.items():
+        scores = [score(run['outputs'][name], truth.get(name, reference[name])) for name in pdfs]
+        latencies = run['latencies']
+        mean = sum(latencies) / len(latencies)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"{model_signature(*config):<22}"
+              f"{sum(s[0] for s in scores) / len(scores):>9.1%}"
+              f"{sum(s[1] for s in scores) / len(scores):>10.1%}"
+              f"{mean * 1000:>11.0f}{p95 * 1000:>10.0f}{1 / mean:>9.2f}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,213 @@
+"""
+Process pool for DocTR inference.
+
+The model is torch/CPU bound, so running it inside the FastAPI event loop
+(or a thread) serializes every upload. Each worker process loads its own
+copy of the model once and runs extract_fields_from_pdfs() there.
+
+Concurrent requests are micro-batched: documents arriving within
+OCR_BATCH_WINDOW_MS (or until OCR_BATCH_MAX_DOCS are waiting) are sent to
+a worker as one extract_fields_from_pdfs() call, so DocTR sees full
+batches instead of one page at a time, and the per-request results are
+fanned back out afterwards.
+
+The pool is bounded: at most OCR_QUEUE_SIZE requests may be queued or
+running at once; beyond that extract() raises PoolFull and the API answers
+HTTP 429 so clients back off instead of piling up.
+
+If a worker process dies (OOM, a crash inside torch) the executor is
+broken for good; the pool replaces it and only the batches that were
+running on the dead executor fail.
+"""
+import os
+import time
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+OCR_WORKERS = int(os.environ.get('OCR_WORKERS', '2'))
+# torch threads per worker; by default the cores are split between workers
+OCR_THREADS = int(os.environ.get('OCR_THREADS', '0')) or max(1, (os.cpu_count() or 1) // OCR_WORKERS)
+OCR_QUEUE_SIZE = int(os.environ.get('OCR_QUEUE_SIZE', '16'))
+OCR_BATCH_WINDOW_MS = float(os.environ.get('OCR_BATCH_WINDOW_MS', '20'))
+OCR_BATCH_MAX_DOCS = int(os.environ.get('OCR_BATCH_MAX_DOCS', '16'))
+
+# ── Worker process side ──────────────────────────────────────
+
+_model = None
+
+
+def _init_worker(threads):
+    global _model
+    from step8_predict_pdf import load_ocr_model
+    _model = load_ocr_model(threads=threads)
+
+
+def _run(pdfs, template, first_page_only):
+    """Runs inside a worker. Returns (per_doc results, service seconds)."""
+    from step8_predict_pdf import extract_fields_from_pdfs
+    started = time.perf_counter()
+    per_doc = extract_fields_from_pdfs(pdfs, _model, template, first_page_only)
+    # Exceptions are sent back as plain RuntimeErrors so they always pickle
+    per_doc = [RuntimeError(str(d)) if isinstance(d, Exception) else d for d in per_doc]
+    return per_doc, time.perf_counter() - started
+
+
+# ── API process side ─────────────────────────────────────────
+
+class PoolFull(Exception):
+    """Raised when OCR_QUEUE_SIZE requests are already queued or running."""
+
+
+class InferencePool:
+
+    def __init__(self, workers: int = OCR_WORKERS, queue_size: int = OCR_QUEUE_SIZE,
+                 batch_window_ms: float = OCR_BATCH_WINDOW_MS, batch_max_docs: int = OCR_BATCH_MAX_DOCS):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.batch_window = batch_window_ms / 1000
+        self.batch_max_docs = batch_max_docs
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        # (template, first_page_only) → {'items': [(pdfs, future)], 'docs': n, 'timer': handle}
+        self._pending = {}
+        self.batches = 0
+        self.batched_docs = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.restarts = 0
+        self.avg_service_ms = 0.0   # model time per batch (EWMA)
+        self.avg_latency_ms = 0.0   # queue wait + model time (EWMA)
+
+    def start(self):
+        # spawn, not fork: torch and forked threads don't mix
+        ctx = multiprocessing.get_context('spawn')
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=ctx,
+            initializer=_init_worker, initargs=(OCR_THREADS,)
+        )
+
+    def shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _restart(self, broken):
+        """Replace a broken executor (once, however many batches notice it)."""
+        with self._lock:
+            if self._executor is not broken:
+                return
+            print('OCR worker process died; restarting the worker pool')
+            broken.shutdown(wait=False, cancel_futures=True)
+            self.start()
+            self.restarts += 1
+
+    def _submit(self, pdfs, template, first_page_only):
+        """Submit a batch; a pool that is already broken is rebuilt and retried once."""
+        executor = self._executor
+        try:
+            return executor, executor.submit(_run, pdfs, template, first_page_only)
+        except BrokenProcessPool:
+            self._restart(executor)
+            executor = self._executor
+            return executor, executor.submit(_run, pdfs, template, first_page_only)
+
+    def _ewma(self, current, sample):
+        return sample if current == 0 else current * 0.9 + sample * 0.1
+
+    # ── micro-batching (runs on the event loop thread) ──
+
+    def _enqueue(self, pdfs, template, first_page_only) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        key = (template, first_page_only)
+        future = loop.create_future()
+
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = {'items': [], 'docs': 0, 'timer': None}
+            batch['timer'] = loop.call_later(self.batch_window, self._flush, key)
+        batch['items'].append((pdfs, future))
+        batch['docs'] += len(pdfs)
+
+        if batch['docs'] >= self.batch_max_docs:
+            self._flush(key)
+        return future
+
+    def _flush(self, key):
+        batch = self._pending.pop(key, None)
+        if batch is None:
+            return
+        batch['timer'].cancel()
+        asyncio.ensure_future(self._dispatch(key, batch['items']))
+
+    async def _dispatch(self, key, items):
+        """Run one batch in a worker and hand each request its slice of the results."""
+        template, first_page_only = key
+        pdfs = [pdf for request_pdfs, _ in items for pdf in request_pdfs]
+        executor = None
+        try:
+            executor, future = self._submit(pdfs, template, first_page_only)
+            per_doc, service_s = await asyncio.wrap_future(future)
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool) and executor is not None:
+                # A worker died mid-batch: fail this batch, keep serving the rest
+                self._restart(executor)
+            for _, waiter in items:
+                if not waiter.done():
+                    waiter.set_exception(e)
+            return
+
+        with self._lock:
+            self.batches += 1
+            self.batched_docs += len(pdfs)
+            self.avg_service_ms = self._ewma(self.avg_service_ms, service_s * 1000)
+
+        offset = 0
+        for request_pdfs, waiter in items:
+            if not waiter.done():
+                waiter.set_result(per_doc[offset:offset + len(request_pdfs)])
+            offset += len(request_pdfs)
+
+    async def extract(self, pdfs: list, template: str = None, first_page_only: bool = False) -> list:
+        """Run extract_fields_from_pdfs() in a worker. Raises PoolFull when saturated."""
+        with self._lock:
+            if self._in_flight >= self.queue_size:
+                self.rejected += 1
+                raise PoolFull(f'OCR queue full ({self.queue_size} requests in flight)')
+            self._in_flight += 1
+
+        started = time.perf_counter()
+        try:
+            per_doc = await self._enqueue(pdfs, template, first_page_only)
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+        with self._lock:
+            self.completed += 1
+            self.avg_latency_ms = self._ewma(self.avg_latency_ms, (time.perf_counter() - started) * 1000)
+        return per_doc
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queue_capacity': self.queue_size,
+                'in_flight': self._in_flight,
+                'queue_depth': max(0, self._in_flight - self.workers),
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'restarts': self.restarts,
+                'batches': self.batches,
+                'avg_batch_docs': round(self.batched_docs / self.batches, 1) if self.batches else 0.0,
+                'avg_service_ms': round(self.avg_service_ms, 1),
+                'avg_latency_ms': round(self.avg_latency_ms, 1),
+            }
@@ -0,0 +1,114 @@
+"""
+Content-addressed cache of OCR extraction results.
+
+Re-uploading the same PDF (a retry, or the same invoice from another
+device) skips DocTR entirely. Entries are keyed by SHA-256 of the file
+bytes plus the template version, so editing a template naturally misses
+the old results. Each entry is one JSON file under RESULT_CACHE_DIR; the
+directory is kept under RESULT_CACHE_MAX_MB by evicting the least
+recently used files.
+"""
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULT_CACHE_DIR = os.environ.get('RESULT_CACHE_DIR', os.path.join(BASE_DIR, 'result_cache'))
+RESULT_CACHE_MAX_BYTES = int(float(os.environ.get('RESULT_CACHE_MAX_MB', '256')) * 1024 * 1024)
+
+
+def cache_key(pdf: bytes, template_version: str, first_page_only: bool = False) -> str:
+    """SHA-256 of the PDF bytes, qualified by template version and page mode."""
+    digest = hashlib.sha256(pdf).hexdigest()
+    mode = 'p1' if first_page_only else 'all'
+    return hashlib.sha256(f'{digest}|{template_version}|{mode}'.encode()).hexdigest()
+
+
+class ResultCache:
+    """Thread-safe, size-bounded LRU of extraction results on local disk."""
+
+    def __init__(self, directory: str = RESULT_CACHE_DIR, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._sizes = OrderedDict()   # key → file size, least recently used first
+        self._total = 0
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.json')
+
+    def _scan(self):
+        """Rebuild the LRU order from file mtimes (touched on every hit)."""
+        entries = []
+        for filename in os.listdir(self.directory):
+            if filename.endswith('.json'):
+                st = os.stat(os.path.join(self.directory, filename))
+                entries.append((st.st_mtime_ns, filename[:-5], st.st_size))
+        for _, key, size in sorted(entries):
+            self._sizes[key] = size
+            self._total += size
+        self._evict()
+
+    def _evict(self):
+        """Drop least recently used files until under max_bytes. Caller holds the lock."""
+        while self._total > self.max_bytes and self._sizes:
+            key, size = self._sizes.popitem(last=False)
+            self._total -= size
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def get(self, key: str):
+        """Cached result for key, or None."""
+        with self._lock:
+            if key not in self._sizes:
+                self.misses += 1
+                return None
+            path = self._path(key)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    result = json.load(f)
+                os.utime(path)
+            except (OSError, ValueError):
+                self._total -= self._sizes.pop(key)
+                self.misses += 1
+                return None
+            self._sizes.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: str, result):
+        """Store a JSON-serializable result, evicting old entries past max_bytes."""
+        data = json.dumps(result).encode('utf-8')
+        path = self._path(key)
+        with self._lock:
+            tmp_path = path + '.tmp'
+            try:
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f'Result cache write failed: {e}')
+                return
+            self._total += len(data) - self._sizes.pop(key, 0)
+            self._sizes[key] = len(data)
+            self._evict()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._sizes),
+                'bytes': self._total,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+            }
@@ -1,12 +1,63 @@
 import os
 import sys
 import json
-from doctr.io import DocumentFile
-from doctr.models import ocr_predictor
+from collections import defaultdict
 
-def load_ocr_model():
-    print("Loading DocTR OCR model...")
-    ocr_model = ocr_predictor(det_arch='db_resnet50', reco_arch='crnn_vgg16_bn', pretrained=True)
+import numpy as np
+
+from template_registry import registry, AUTO_TEMPLATE
+
+# DocTR (and torch) are imported where they are used, so the API process
+# can import this module without loading the model stack.
+
+# Detection + recognition architectures per deployment profile
+MODEL_PROFILES = {
+    'accurate': {'det_arch': 'db_resnet50', 'reco_arch': 'crnn_vgg16_bn'},
+    'balanced': {'det_arch': 'db_mobilenet_v3_large', 'reco_arch': 'crnn_vgg16_bn'},
+    'fast': {'det_arch': 'db_mobilenet_v3_large', 'reco_arch': 'crnn_mobilenet_v3_small'},
+}
+OCR_PROFILE = os.environ.get('OCR_PROFILE', 'accurate')
+OCR_QUANTIZE = os.environ.get('OCR_QUANTIZE', '0') == '1'
+OCR_THREADS = int(os.environ.get('OCR_THREADS', '0'))   # 0 = torch default
+# 'full' = detection + recognition, 'crop' = recognition on template ROIs
+OCR_MODE = os.environ.get('OCR_MODE', 'full')
+
+
+def model_signature(profile: str = None, quantize: bool = None) -> str:
+    """Identifies the configured model, e.g. 'fast+int8+crop'."""
+    profile = profile or OCR_PROFILE
+    quantize = OCR_QUANTIZE if quantize is None else quantize
+    return profile + ('+int8' if quantize else '') + ('+crop' if OCR_MODE == 'crop' else '')
+
+
+def load_ocr_model(profile: str = None, quantize: bool = None, threads: int = None):
+    """
+    Build the DocTR predictor for a profile in MODEL_PROFILES.
+    quantize: dynamic int8 quantization of the Linear/LSTM layers (mostly
+    speeds up recognition; the convolutional detector stays fp32).
+    threads: torch intra-op threads for this process.
+    """
+    import torch
+    from doctr.models import ocr_predictor
+
+    profile = profile or OCR_PROFILE
+    quantize = OCR_QUANTIZE if quantize is None else quantize
+    threads = OCR_THREADS if threads is None else threads
+    if profile not in MODEL_PROFILES:
+        raise ValueError(f"Unknown OCR profile '{profile}'. Available: {', '.join(MODEL_PROFILES)}")
+
+    if threads > 0:
+        torch.set_num_threads(threads)
+
+    print(f"Loading DocTR OCR model ({model_signature(profile, quantize)})...")
+    ocr_model = ocr_predictor(**MODEL_PROFILES[profile], pretrained=True)
+
+    if quantize:
+        layers = {torch.nn.Linear, torch.nn.LSTM}
+        ocr_model.det_predictor.model = torch.ao.quantization.quantize_dynamic(
+            ocr_model.det_predictor.model, layers, dtype=torch.qint8)
+        ocr_model.reco_predictor.model = torch.ao.quantization.quantize_dynamic(
+            ocr_model.reco_predictor.model, layers, dtype=torch.qint8)
     return ocr_model
 
 def box_center(box):
@@ -60,24 +111,16 @@ def is_inside(word_box, target_box):
     # Or if the word heavily overlaps with the expanded box (>40% of the word's area is inside)
     return calculate_iou(word_box, expanded_target) > 0.4
 
-def extract_fields_from_pdf(pdf_path: str, ocr_model, mapping_file="template_mapping.json") -> dict:
+# Pages per DocTR forward pass for batch extraction (bounds peak memory)
+OCR_BATCH_PAGES = int(os.environ.get('OCR_BATCH_PAGES', '32'))
+
+
+def page_words(page) -> list:
     """
-    Extract structured fields from a PDF file using predefined bounding boxes.
+    Flatten a DocTR result page into a list of words with boxes
+    normalized to the 0-1000 space used by template_mapping.json.
     """
-    if not os.path.exists(mapping_file):
-        raise FileNotFoundError(f"Mapping file not found: {mapping_file}")
-        
-    with open(mapping_file) as f:
-        field_mapping = json.load(f)
-    
-    print("Running OCR predictor...")
-    doc = DocumentFile.from_pdf(pdf_path)
-    result = ocr_model(doc)
-
-    # We extract from the first page since the mapping is for page 1
-    page = result.pages[0]
     words_data = []
-    
     for block in page.blocks:
         for line in block.lines:
             for word in line.words:
@@ -89,47 +132,344 @@ def extract_fields_from_pdf(pdf_path: str, ocr_model, mapping_file="template_map
                         int(g[1][0] * 1000), int(g[1][1] * 1000)
                     ]
                 })
+    return words_data
 
-    extracted = {}
-    
-    # For each defined field box, find all words that are inside it.
-    for field_name, target_box in field_mapping.items():
-        field_words = []
-        for w in words_data:
-            if is_inside(w['box'], target_box):
-                field_words.append(w)
-                
-        # Sort words primarily by Y coordinate (lines), then X coordinate (left-to-right)
-        # Group them into lines if they are somewhat close vertically.
-        lines = []
-        for fw in field_words:
-            added = False
-            for line in lines:
-                if abs(box_center(line[0]['box'])[1] - box_center(fw['box'])[1]) < 15:
-                    line.append(fw)
-                    added = True
-                    break
-            if not added:
-                lines.append([fw])
-                
-        # Sort lines top-to-bottom
-        lines.sort(key=lambda l: box_center(l[0]['box'])[1])
-        
-        # Sort words in each line left-to-right and join
-        text_parts = []
-        for line in lines:
-            line.sort(key=lambda w: box_center(w['box'])[0])
-            text_parts.append(' '.join([w['text'] for w in line]))
-            
-        final_text = ' '.join(text_parts).strip()
-        
-        extracted[field_name] = final_text
 
-    return extracted
+# Cell size of the field lookup grid, in the 0-1000 page space
+GRID_CELL = 50
+
+# Words whose centers are closer than this vertically share a line
+LINE_TOLERANCE = 15
+
+
+class FieldGrid:
+    """
+    Uniform grid over a template's field boxes, so each OCR word is only
+    tested against the few fields whose (expanded) box it can touch,
+    instead of against every field.
+    """
+
+    def __init__(self, field_mapping: dict, cell: int = GRID_CELL):
+        self.cell = cell
+        self.names = list(field_mapping)
+        self.boxes = [field_mapping[name] for name in self.names]
+        self.cells = defaultdict(list)
+
+        for idx, box in enumerate(self.boxes):
+            # Same horizontal margin as is_inside() so no match is missed
+            x0, y0, x1, y1 = box[0] - 5, box[1], box[2] + 5, box[3]
+            for cx in range(int(x0) // cell, int(x1) // cell + 1):
+                for cy in range(int(y0) // cell, int(y1) // cell + 1):
+                    self.cells[(cx, cy)].append(idx)
+
+    def candidates(self, box) -> set:
+        """Indices of fields whose grid cells overlap the word box."""
+        cell = self.cell
+        found = set()
+        for cx in range(int(box[0]) // cell, int(box[2]) // cell + 1):
+            for cy in range(int(box[1]) // cell, int(box[3]) // cell + 1):
+                found.update(self.cells.get((cx, cy), ()))
+        return found
+
+
+def join_lines(field_words: list) -> str:
+    """
+    Group a field's words into lines and read them top-to-bottom, left-to-right.
+    Sort by vertical center once, then sweep: a word more than LINE_TOLERANCE
+    below the first word of the current line starts a new line.
+    """
+    field_words = sorted(field_words, key=lambda w: box_center(w['box'])[1])
+
+    lines = []
+    line_y = None
+    for fw in field_words:
+        cy = box_center(fw['box'])[1]
+        if line_y is None or cy - line_y >= LINE_TOLERANCE:
+            lines.append([])
+            line_y = cy
+        lines[-1].append(fw)
+
+    text_parts = []
+    for line in lines:
+        line.sort(key=lambda w: box_center(w['box'])[0])
+        text_parts.append(' '.join([w['text'] for w in line]))
+
+    return ' '.join(text_parts).strip()
+
+
+def assign_fields(words_data: list, field_mapping: dict, grid: FieldGrid = None) -> dict:
+    """
+    Map OCR words onto the template's field boxes and join each field's text.
+    """
+    grid = grid or FieldGrid(field_mapping)
+    per_field = [[] for _ in grid.names]
+
+    # Route each word only to the fields the grid says it can touch
+    for w in words_data:
+        for idx in grid.candidates(w['box']):
+            if is_inside(w['box'], grid.boxes[idx]):
+                per_field[idx].append(w)
+
+    return {name: join_lines(words) for name, words in zip(grid.names, per_field)}
+
+
+def fields_for_template(words: list, template_name: str = None) -> dict:
+    """
+    Assign a page's words to a template's fields.
+    template_name: a registered template, None for the default, or 'auto'
+    to let the registry pick the layout that best fits the words.
+    """
+    template = registry.resolve(template_name, words)
+    if template.grid is None:
+        template.grid = FieldGrid(template.mapping)
+    return {
+        'template': template.name,
+        'template_version': template.version,
+        'fields': assign_fields(words, template.mapping, template.grid),
+    }
+
+
+# ── Crop-only recognition ────────────────────────────────────
+# For a known template the field rectangles are already known, so
+# full-page text detection can be skipped: crop each field (plus a small
+# margin), split it into text lines by its ink profile and run only the
+# recognizer over all lines of all pages in one batch.
+
+CROP_MARGIN = 6            # 0-1000 units added around each field box
+INK_THRESHOLD = 128        # grey level below which a pixel counts as ink
+MIN_LINE_HEIGHT = 4        # px; thinner ink bands are noise
+# Below this mean recognition confidence the page probably doesn't match
+# the template (shifted scan, other layout) — rerun it with detection
+CROP_MIN_CONFIDENCE = float(os.environ.get('OCR_CROP_MIN_CONFIDENCE', '0.5'))
+
+
+def line_strips(crop: np.ndarray) -> list:
+    """
+    Split a field crop into single text lines using its horizontal ink
+    profile. Ruled lines and box borders (rows/columns that are almost all
+    ink) are ignored. Returns [(y0, y1), ...]; empty for a blank field.
+    """
+    ink = crop.mean(axis=2) < INK_THRESHOLD if crop.ndim == 3 else crop < INK_THRESHOLD
+    if ink.size == 0:
+        return []
+    ink = ink & ~(ink.mean(axis=0) > 0.9)[None, :]
+    rows = ink.any(axis=1) & ~(ink.mean(axis=1) > 0.9)
+
+    strips, start = [], None
+    for y, has_ink in enumerate(np.append(rows, False)):
+        if has_ink and start is None:
+            start = y
+        elif not has_ink and start is not None:
+            if y - start >= MIN_LINE_HEIGHT:
+                strips.append((max(0, start - 2), min(len(rows), y + 2)))
+            start = None
+    return strips
+
+
+def extract_fields_by_crops(pages: list, ocr_model, template_name: str = None) -> list:
+    """
+    Recognition-only extraction against a known template.
+    Returns one result dict per page (see fields_for_template), or None
+    for pages whose recognition confidence is too low to trust.
+    """
+    template = registry.get(template_name)
+    margin = CROP_MARGIN / 1000
+
+    lines, owners = [], []   # owners: (page index, field index) per line crop
+    for page_idx, page in enumerate(pages):
+        h, w = page.shape[:2]
+        for field_idx, box in enumerate(template.boxes):
+            x0 = max(0, int((box[0] / 1000 - margin) * w))
+            y0 = max(0, int((box[1] / 1000 - margin) * h))
+            x1 = min(w, int((box[2] / 1000 + margin) * w))
+            y1 = min(h, int((box[3] / 1000 + margin) * h))
+            crop = page[y0:y1, x0:x1]
+            for top, bottom in line_strips(crop):
+                lines.append(crop[top:bottom])
+                owners.append((page_idx, field_idx))
+
+    predictions = ocr_model.reco_predictor(lines) if lines else []
+
+    texts = [[[] for _ in template.names] for _ in pages]
+    confidences = [[] for _ in pages]
+    for (page_idx, field_idx), (value, confidence) in zip(owners, predictions):
+        texts[page_idx][field_idx].append(value)
+        confidences[page_idx].append(confidence)
+
+    results = []
+    for page_idx in range(len(pages)):
+        scores = confidences[page_idx]
+        if not scores or sum(scores) / len(scores) < CROP_MIN_CONFIDENCE:
+            results.append(None)
+            continue
+        results.append({
+            'template': template.name,
+            'template_version': template.version,
+            'fields': {
+                name: ' '.join(parts).strip()
+                for name, parts in zip(template.names, texts[page_idx])
+            },
+            'mode': 'crop',
+        })
+    return results
+
+
+def extract_fields_from_pages(pages: list, ocr_model, template: str = None, mode: str = None) -> list:
+    """
+    Run DocTR over many rendered pages at once.
+    Returns one {'template', 'template_version', 'fields', 'mode'} dict per page.
+    Pages go through the model in batches of OCR_BATCH_PAGES.
+
+    mode 'crop' (needs a named template, not 'auto') recognizes only the
+    template's field regions; pages it isn't confident about fall back to
+    the full detection + recognition pipeline.
+    """
+    mode = mode or OCR_MODE
+    results = [None] * len(pages)
+
+    if mode == 'crop' and template != AUTO_TEMPLATE:
+        for i in range(0, len(pages), OCR_BATCH_PAGES):
+            results[i:i + OCR_BATCH_PAGES] = extract_fields_by_crops(
+                pages[i:i + OCR_BATCH_PAGES], ocr_model, template)
+
+    todo = [i for i, result in enumerate(results) if result is None]
+    if mode == 'crop' and todo:
+        print(f"Crop mode not confident on {len(todo)} page(s), running full OCR")
+    for i in range(0, len(todo), OCR_BATCH_PAGES):
+        chunk = todo[i:i + OCR_BATCH_PAGES]
+        result = ocr_model([pages[j] for j in chunk])
+        for j, page in zip(chunk, result.pages):
+            results[j] = {**fields_for_template(page_words(page), template), 'mode': 'full'}
+    return results
+
+
+# Digital PDFs: read the embedded text layer instead of running OCR.
+# The text layer is only trusted if it puts words in at least this share
+# of the template's field boxes; printed labels alone (an unflattened
+# fillable form, a scan with a digital header) fall back to OCR.
+OCR_TEXT_LAYER = os.environ.get('OCR_TEXT_LAYER', '1') == '1'
+TEXT_LAYER_MIN_COVERAGE = float(os.environ.get('OCR_TEXT_LAYER_MIN_COVERAGE', '0.5'))
+
+# Render resolution for scanned pages; a template can override it with
+# "_meta": {"dpi": ...}
+OCR_RENDER_DPI = int(os.environ.get('OCR_RENDER_DPI', '144'))
+
+
+def pipeline_signature() -> str:
+    """
+    model_signature() plus the page-input settings that change results,
+    e.g. 'accurate|text:0.5|dpi144' (part of result cache keys).
+    """
+    text_layer = f'text:{TEXT_LAYER_MIN_COVERAGE}' if OCR_TEXT_LAYER else 'notext'
+    return f'{model_signature()}|{text_layer}|dpi{OCR_RENDER_DPI}'
+
+
+def text_layer_words(page) -> list:
+    """
+    Words from a PyMuPDF page's embedded text, in the same format as
+    page_words() (boxes normalized to the 0-1000 space).
+    """
+    width, height = page.rect.width, page.rect.height
+    words_data = []
+    for x0, y0, x1, y1, text, *_ in page.get_text('words'):
+        words_data.append({
+            'text': text,
+            'box': [
+                int(x0 / width * 1000), int(y0 / height * 1000),
+                int(x1 / width * 1000), int(y1 / height * 1000)
+            ]
+        })
+    return words_data
+
+
+def text_layer_covers_fields(words: list, template: str = None) -> bool:
+    """True if the words fill enough of the template's field boxes to skip OCR."""
+    if not words:
+        return False
+    word_boxes = np.asarray([w['box'] for w in words], dtype=np.int32).reshape(-1, 4)
+    return registry.resolve(template, words).coverage(word_boxes) >= TEXT_LAYER_MIN_COVERAGE
+
+
+def render_dpi(template: str = None) -> int:
+    """Rasterization DPI for a template ('_meta.dpi'), else OCR_RENDER_DPI."""
+    if template == AUTO_TEMPLATE:
+        return OCR_RENDER_DPI
+    return int(registry.get(template).meta.get('dpi', OCR_RENDER_DPI))
+
+
+def render_page(page, dpi: int) -> np.ndarray:
+    """Rasterize a PyMuPDF page to an RGB (H, W, 3) uint8 array for DocTR."""
+    pix = page.get_pixmap(dpi=dpi, alpha=False)
+    return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)[:, :, :3].copy()
+
+
+def extract_fields_from_pdfs(pdfs: list, ocr_model, template: str = None,
+                             first_page_only: bool = False, text_layer: bool = None) -> list:
+    """
+    Extract fields from every page of every PDF. Each page is treated as one invoice.
+
+    Pages whose text layer covers the template's fields (digitally
+    generated PDFs) are read directly, with no OCR. Only the rest are
+    rendered (at the template's DPI) and run through the model, together
+    in one batched run.
+
+    pdfs: file paths or in-memory PDF data (bytes / bytearray / memoryview);
+    in-memory PDFs are read straight from the buffer, never written to disk.
+
+    Returns one entry per input PDF: a list of per-page results
+    (see extract_fields_from_pages; 'mode' is 'text' for text-layer pages),
+    or the exception raised while reading it.
+    """
+    import fitz
+
+    text_layer = OCR_TEXT_LAYER if text_layer is None else text_layer
+    dpi = render_dpi(template)
+    pages, owners, per_doc = [], [], []
+    for doc_idx, pdf in enumerate(pdfs):
+        try:
+            if isinstance(pdf, (bytes, bytearray, memoryview)):
+                doc = fitz.open(stream=bytes(pdf), filetype='pdf')
+            else:
+                doc = fitz.open(pdf)
+            results, doc_pages = [], []
+            with doc:
+                for page_no, page in enumerate(doc):
+                    if first_page_only and page_no > 0:
+                        break
+                    words = text_layer_words(page) if text_layer else []
+                    if text_layer_covers_fields(words, template):
+                        results.append({**fields_for_template(words, template), 'mode': 'text'})
+                    else:
+                        results.append(None)
+                        doc_pages.append((page_no, render_page(page, dpi)))
+        except Exception as e:
+            per_doc.append(e)
+            continue
+        per_doc.append(results)
+        for page_no, image in doc_pages:
+            pages.append(image)
+            owners.append((doc_idx, page_no))
+
+    if pages:
+        print(f"Running OCR predictor on {len(pages)} page(s) from {len(pdfs)} PDF(s)...")
+    for (doc_idx, page_no), page_result in zip(owners, extract_fields_from_pages(pages, ocr_model, template)):
+        per_doc[doc_idx][page_no] = page_result
+    return per_doc
+
+
+def extract_fields_from_pdf(pdf, ocr_model, template: str = None) -> dict:
+    """
+    Extract structured fields from a PDF (path or bytes) using predefined bounding boxes.
+    """
+    # We extract from the first page since the mapping is for page 1
+    result = extract_fields_from_pdfs([pdf], ocr_model, template, first_page_only=True)[0]
+    if isinstance(result, Exception):
+        raise result
+    return result[0]['fields']
 
 if __name__ == '__main__':
     if len(sys.argv) < 2:
-        print("Usage: python step8_predict_pdf.py <pdf_path>")
+        print("Usage: python step8_predict_pdf.py <pdf_path> [template|auto]")
         print("Example: python step8_predict_pdf.py msme_blank_template.pdf")
         exit(1)
 
@@ -139,7 +479,7 @@ if __name__ == '__main__':
         exit(1)
 
     ocr_model = load_ocr_model()
-    result = extract_fields_from_pdf(pdf_path, ocr_model)
+    result = extract_fields_from_pdf(pdf_path, ocr_model, sys.argv[2] if len(sys.argv) > 2 else None)
 
     print("=" * 60)
     print(f"EXTRACTED FIELDS FROM: {os.path.basename(pdf_path)}")
@@ -0,0 +1,149 @@
+"""
+Template registry for the invoice OCR pipeline.
+
+Loads every layout mapping once — template_mapping.json (the "default"
+MSMED layout) plus any templates/<name>.json — into compact NumPy arrays,
+and reloads a file automatically when it changes on disk.
+
+A template file is {FIELD_NAME: [x0, y0, x1, y1], ...} in the 0-1000 page
+space, optionally with a "_meta" object for per-template settings.
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_TEMPLATE_FILE = os.path.join(BASE_DIR, 'template_mapping.json')
+TEMPLATE_DIR = os.path.join(BASE_DIR, 'templates')
+DEFAULT_TEMPLATE = 'default'
+AUTO_TEMPLATE = 'auto'
+
+# How often (seconds) to stat the template files for changes
+RELOAD_INTERVAL = float(os.environ.get('TEMPLATE_RELOAD_INTERVAL', '2'))
+
+
+class Template:
+    """One parsed layout: field names, an (N, 4) box array and a content version."""
+
+    def __init__(self, name: str, path: str):
+        self.name = name
+        self.path = path
+        self.mtime = os.stat(path).st_mtime_ns
+
+        with open(path, 'rb') as f:
+            raw = f.read()
+        data = json.loads(raw)
+
+        self.version = hashlib.sha1(raw).hexdigest()[:12]
+        self.meta = data.pop('_meta', {})
+        self.mapping = {k: v for k, v in data.items() if not k.startswith('_')}
+        self.names = list(self.mapping)
+        self.boxes = np.asarray([self.mapping[n] for n in self.names], dtype=np.int32).reshape(-1, 4)
+
+        # Word → field lookup grid, built by step8_predict_pdf on first use
+        self.grid = None
+
+    def coverage(self, word_boxes: np.ndarray) -> float:
+        """Fraction of this template's fields with at least one word center inside."""
+        if len(word_boxes) == 0 or len(self.boxes) == 0:
+            return 0.0
+        cx = (word_boxes[:, 0] + word_boxes[:, 2]) / 2
+        cy = (word_boxes[:, 1] + word_boxes[:, 3]) / 2
+        b = self.boxes
+        inside = (
+            (cx[:, None] >= b[None, :, 0] - 5) & (cx[:, None] <= b[None, :, 2] + 5) &
+            (cy[:, None] >= b[None, :, 1]) & (cy[:, None] <= b[None, :, 3])
+        )
+        return float(inside.any(axis=0).mean())
+
+
+class TemplateRegistry:
+    """
+    All known templates, keyed by name. Thread-safe; re-reads a template
+    file (and picks up new/removed files) when it changes on disk.
+    """
+
+    def __init__(self, default_file: str = DEFAULT_TEMPLATE_FILE, template_dir: str = TEMPLATE_DIR):
+        self.default_file = default_file
+        self.template_dir = template_dir
+        self._lock = threading.Lock()
+        self._templates = {}
+        self._checked_at = 0.0
+        self.reload()
+
+    def _sources(self) -> dict:
+        sources = {}
+        if os.path.exists(self.default_file):
+            sources[DEFAULT_TEMPLATE] = self.default_file
+        if os.path.isdir(self.template_dir):
+            for filename in sorted(os.listdir(self.template_dir)):
+                if filename.endswith('.json'):
+                    sources[filename[:-5]] = os.path.join(self.template_dir, filename)
+        return sources
+
+    def reload(self):
+        """Load new or changed template files and forget deleted ones."""
+        with self._lock:
+            sources = self._sources()
+            templates = {}
+            for name, path in sources.items():
+                current = self._templates.get(name)
+                try:
+                    if current and current.path == path and current.mtime == os.stat(path).st_mtime_ns:
+                        templates[name] = current
+                    else:
+                        templates[name] = Template(name, path)
+                        print(f"Loaded template '{name}' (v{templates[name].version}, {len(templates[name].names)} fields)")
+                except Exception as e:
+                    # Keep serving the last good version of a broken file
+                    print(f"Failed to load template '{name}': {e}")
+                    if current:
+                        templates[name] = current
+            self._templates = templates
+            self._checked_at = time.time()
+
+    def _maybe_reload(self):
+        if time.time() - self._checked_at >= RELOAD_INTERVAL:
+            self.reload()
+
+    def names(self) -> list:
+        self._maybe_reload()
+        return list(self._templates)
+
+    def get(self, name: str = None) -> Template:
+        """Template by name (default layout if None). Raises KeyError if unknown."""
+        self._maybe_reload()
+        name = name or DEFAULT_TEMPLATE
+        if name not in self._templates:
+            raise KeyError(f"Unknown template '{name}'. Available: {', '.join(self._templates)}")
+        return self._templates[name]
+
+    def classify(self, words: list) -> Template:
+        """Pick the template whose field boxes are best covered by the page's words."""
+        self._maybe_reload()
+        if not self._templates:
+            raise KeyError('No templates loaded')
+        word_boxes = np.asarray([w['box'] for w in words], dtype=np.int32).reshape(-1, 4)
+        return max(self._templates.values(), key=lambda t: t.coverage(word_boxes))
+
+    def version(self, name: str = None) -> str:
+        """Content version for a template name; for 'auto', of every loaded template."""
+        if name == AUTO_TEMPLATE:
+            self._maybe_reload()
+            joined = ','.join(f'{t.name}:{t.version}' for t in self._templates.values())
+            return 'auto:' + hashlib.sha1(joined.encode()).hexdigest()[:12]
+        template = self.get(name)
+        return f'{template.name}:{template.version}'
+
+    def resolve(self, name: str, words: list) -> Template:
+        """get() for a named template, classify() for 'auto'."""
+        if name == AUTO_TEMPLATE:
+            return self.classify(words)
+        return self.get(name)
+
+
+registry = TemplateRegistry()
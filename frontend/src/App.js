@@ -2,8 +2,8 @@ import { useState, useEffect, useRef } from "react";
 import {
   extractInvoicePDF, createInvoice, getAllInvoices, markPaid,
   login, signup, logout, getToken, getStoredUser,
-  sendChatMessage, getChatHistory, clearChatHistory,
-  sendNotice, getNotices, exportCasePDF,
+  streamChatMessage, getChatHistory, clearChatHistory,
+  sendNotice, waitForNoticeJob, getNotices, exportCasePDF,
 } from './api';
 
 // ─────────────────────────────────────────────
@@ -982,10 +982,13 @@ function DashboardScreen({ invoice, onBack }) {
     setNoticeResult(null);
     try {
       const tmpl = selectedTemplate ? Number(selectedTemplate) : null;
-      const res = await sendNotice(invoice.id, tmpl, ["email"]);
+      const queued = await sendNotice(invoice.id, tmpl, ["email"]);
+      const res = await waitForNoticeJob(queued.job_id);
       const sent = res?.results?.email;
       if (sent?.success) {
         setNoticeResult({ ok: true, msg: `✅ Email sent! Template ${res.template_no}` });
+      } else if (res?.status === "queued" || res?.status === "running") {
+        setNoticeResult({ ok: true, msg: `⏳ Notice queued — it will be retried automatically` });
       } else {
         setNoticeResult({ ok: false, msg: `❌ Failed: ${sent?.error || "Unknown error"}` });
       }
@@ -1414,19 +1417,38 @@ function ChatWidget() {
     setLoading(true);
     setShowSuggestions(false);
 
+    // Placeholder bot message, filled in as sources/tokens stream in
+    const botTime = new Date();
+    const updateBot = (patch) => setMessages(prev => prev.map(m =>
+      m.time === botTime ? { ...m, ...patch(m) } : m
+    ));
+
     try {
-      const data = await sendChatMessage(question.trim());
-      if (data) {
-        setMessages(prev => [...prev, {
-          role: "bot",
-          text: data.answer || "I couldn't find an answer.",
-          sources: data.sources || [],
-          time: new Date(),
-        }]);
-      } else {
-        setMessages(prev => [...prev, {
-          role: "bot", text: "Sorry, something went wrong.", sources: [], time: new Date(),
-        }]);
+      let started = false;
+      const startBot = () => {
+        if (started) return;
+        started = true;
+        setLoading(false);
+        setMessages(prev => [...prev, { role: "bot", text: "", sources: [], time: botTime }]);
+      };
+
+      const data = await streamChatMessage(question.trim(), (event) => {
+        startBot();
+        if (event.type === "sources") {
+          updateBot(() => ({ sources: event.sources || [] }));
+        } else if (event.type === "token") {
+          updateBot(m => ({ text: m.text + event.text }));
+        } else if (event.type === "done") {
+          updateBot(() => ({
+            text: event.answer || "I couldn't find an answer.",
+            sources: event.sources || [],
+          }));
+        }
+      });
+
+      if (!data) {
+        startBot();
+        updateBot(() => ({ text: "Sorry, something went wrong." }));
       }
     } catch (err) {
       setMessages(prev => [...prev, {
@@ -125,8 +125,25 @@ export async function createInvoice(formData) {
   });
 }
 
+// One page of invoices. params: { limit, cursor, status, buyer, from, to, fields }
+// Returns { invoices, next_cursor } — pass next_cursor back to get the next page.
+export async function getInvoicesPage(params = {}) {
+  const query = new URLSearchParams(
+    Object.entries(params).filter(([, v]) => v !== undefined && v !== null && v !== "")
+  ).toString();
+  return apiFetch(query ? `/invoices?${query}` : "/invoices");
+}
+
 export async function getAllInvoices() {
-  return apiFetch("/invoices");
+  const all = [];
+  let cursor = null;
+  do {
+    const page = await getInvoicesPage({ limit: 200, cursor });
+    if (!page) return null;
+    all.push(...page.invoices);
+    cursor = page.next_cursor;
+  } while (cursor);
+  return all;
 }
 
 export async function getInvoice(invoiceId) {
@@ -181,6 +198,51 @@ export async function sendChatMessage(question) {
   });
 }
 
+/**
+ * Ask a question and stream the answer (Server-Sent Events over fetch).
+ * onEvent is called with each event: {type: "sources"|"token"|"done", ...}
+ * Resolves with the final "done" event.
+ */
+export async function streamChatMessage(question, onEvent) {
+  const res = await fetch(`${BASE_URL}/chat/stream`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      Authorization: `Bearer ${getToken()}`,
+    },
+    body: JSON.stringify({ question }),
+  });
+
+  if (!res.ok) {
+    const json = await res.json().catch(() => ({}));
+    throw new Error(json.error || `API error: ${res.status}`);
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let done = null;
+
+  while (true) {
+    const { value, done: finished } = await reader.read();
+    if (finished) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    // SSE events are separated by a blank line
+    let sep;
+    while ((sep = buffer.indexOf("\n\n")) !== -1) {
+      const raw = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+      const dataLine = raw.split("\n").find((l) => l.startsWith("data: "));
+      if (!dataLine) continue;
+      const event = JSON.parse(dataLine.slice(6));
+      if (event.type === "done") done = event;
+      onEvent(event);
+    }
+  }
+  return done;
+}
+
 export async function getChatHistory() {
   return apiFetch("/chat/history");
 }
@@ -206,6 +268,7 @@ export async function getChatSuggestions() {
 
 /**
  * Manually send a legal notice for an invoice.
+ * The notice is queued — returns { job_id, status, template_no, channels }.
  * @param {string} invoiceId
  * @param {number} templateNo - 1, 2, or 3 (auto-picked if null)
  * @param {string[]} channels - ['email'] | ['whatsapp'] | ['email','whatsapp']
@@ -217,6 +280,28 @@ export async function sendNotice(invoiceId, templateNo = null, channels = ["emai
   });
 }
 
+/**
+ * Get the status of a queued notice job.
+ * status: "queued" | "running" | "done" | "dead", results: {channel: {success, error}}
+ */
+export async function getNoticeJob(jobId) {
+  return apiFetch(`/notices/jobs/${jobId}`);
+}
+
+/**
+ * Poll a notice job until it finishes (done/dead) or timeoutMs passes.
+ * Returns the last job status seen.
+ */
+export async function waitForNoticeJob(jobId, timeoutMs = 20000, intervalMs = 1000) {
+  const deadline = Date.now() + timeoutMs;
+  let job = await getNoticeJob(jobId);
+  while (job && (job.status === "queued" || job.status === "running") && Date.now() < deadline) {
+    await new Promise((r) => setTimeout(r, intervalMs));
+    job = await getNoticeJob(jobId);
+  }
+  return job;
+}
+
 /**
  * Get all notices sent for an invoice.
  */